@@ -0,0 +1,163 @@
+# artifacts.py
+"""
+On-disk layout shared by the KNN recommender backends.
+
+Each model directory holds:
+  <model file>.pkl   : fitted NearestNeighbors, dumped uncompressed so that
+                       joblib.load(mmap_mode='r') maps its arrays instead of
+                       copying them
+  fit_X.npy          : the fitted (scaled) training matrix as a raw, C-contiguous
+                       float32 NumPy array
+  scaler.pkl         : fitted StandardScaler
+  cities_df.arrow    : the city DataFrame as an uncompressed Arrow IPC file
+
+A model directory can also hold versions: versions/<version>/ each with the
+files above, and a CURRENT file naming the one to serve. batch_score.py
+writes a new version and then replaces CURRENT atomically; the backends
+follow the pointer (see hot_swap.py).
+
+Rankings produced by the score models (models/AI-score-model/model) are
+Parquet files holding only the columns the backends read; load_ranking reads
+a projection of them, or of the legacy CSV of the same name.
+
+Memory-mapped files live in the OS page cache, so N Gunicorn workers loading
+the same directory share one physical copy of the arrays and the DataFrame
+columns instead of each unpickling their own.
+"""
+import hashlib
+import os
+import sys
+from collections import namedtuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+SCALER_FILE = 'scaler.pkl'
+FIT_X_FILE = 'fit_X.npy'
+FRAME_FILE = 'cities_df.arrow'
+LEGACY_FRAME_FILE = 'cities_df.pkl'
+
+# version identifies the artifact set; responses cached for one version are
+# never served for another
+Artifacts = namedtuple('Artifacts', ['model', 'scaler', 'df', 'fit_X', 'version'],
+                       defaults=(None,))
+
+
+def file_version(*paths):
+    """ Short fingerprint of the given files, from their size and mtime. """
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def read_pointer(model_path):
+    """ The version CURRENT points at, or None for an unversioned directory. """
+    try:
+        with open(os.path.join(model_path, CURRENT_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_model_path(model_path):
+    """ Directory of the version being served (the directory itself if unversioned). """
+    version = read_pointer(model_path)
+    return os.path.join(model_path, VERSIONS_DIR, version) if version else model_path
+
+
+def publish_version(model_path, version):
+    """ Point CURRENT at versions/<version>, atomically. """
+    tmp = os.path.join(model_path, f"{CURRENT_FILE}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(model_path, CURRENT_FILE))
+
+
+def save_artifacts(model_path, model_file, model, scaler, df):
+    """ Write model, scaler and DataFrame in the memory-mappable layout. """
+    os.makedirs(model_path, exist_ok=True)
+    # compress=0 keeps the arrays raw inside the pickle, which mmap_mode needs
+    joblib.dump(model, os.path.join(model_path, model_file), compress=0)
+    joblib.dump(scaler, os.path.join(model_path, SCALER_FILE), compress=0)
+    np.save(os.path.join(model_path, FIT_X_FILE), np.ascontiguousarray(model._fit_X, dtype=np.float32))
+    feather.write_feather(
+        df.reset_index(drop=True),
+        os.path.join(model_path, FRAME_FILE),
+        compression='uncompressed'
+    )
+
+
+def load_frame(path):
+    """ Load an Arrow IPC file through a memory map. """
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks lets numeric columns without nulls stay zero-copy views
+    return table.to_pandas(split_blocks=True)
+
+
+def load_ranking(path, columns):
+    """
+    Load `columns` of a score model ranking. Falls back to the CSV next to a
+    missing .parquet file. Returns the DataFrame and the file it was read from.
+    """
+    if path.endswith('.parquet') and not os.path.exists(path):
+        csv_path = path[:-len('.parquet')] + '.csv'
+        print(f"{path} not found, falling back to {csv_path}")
+        path = csv_path
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns), path
+    return pd.read_csv(path, usecols=columns)[columns], path
+
+
+def load_artifacts(model_path, model_file):
+    """
+    Load the artifacts of one recommender.
+
+    Falls back to the legacy cities_df.pkl layout when the directory has not
+    been migrated yet (see `python artifacts.py <model_path> <model_file>`).
+    """
+    model = joblib.load(os.path.join(model_path, model_file), mmap_mode='r')
+    scaler = joblib.load(os.path.join(model_path, SCALER_FILE))
+
+    frame_file = os.path.join(model_path, FRAME_FILE)
+    if not os.path.exists(frame_file):
+        print(f"{frame_file} not found, falling back to {LEGACY_FRAME_FILE}")
+        frame_file = os.path.join(model_path, LEGACY_FRAME_FILE)
+        df = pd.read_pickle(frame_file)
+    else:
+        df = load_frame(frame_file)
+
+    fit_X_file = os.path.join(model_path, FIT_X_FILE)
+    if os.path.exists(fit_X_file):
+        fit_X = np.load(fit_X_file, mmap_mode='r')
+    else:
+        fit_X = model._fit_X
+    version = file_version(os.path.join(model_path, model_file),
+                           os.path.join(model_path, SCALER_FILE), frame_file)
+    return Artifacts(model, scaler, df, fit_X, version)
+
+
+def migrate(model_path, model_file, frame_file=LEGACY_FRAME_FILE):
+    """ Rewrite a legacy pickle-only model directory in the new layout. """
+    model = joblib.load(os.path.join(model_path, model_file))
+    scaler = joblib.load(os.path.join(model_path, SCALER_FILE))
+    df = pd.read_pickle(os.path.join(model_path, frame_file))
+    save_artifacts(model_path, model_file, model, scaler, df)
+    print(f"Migrated {model_path} ({len(df)} rows)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print("usage: python artifacts.py <model_path> <model_file> [legacy_df_pickle]")
+        sys.exit(1)
+    migrate(*sys.argv[1:])
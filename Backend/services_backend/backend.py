@@ -1,55 +1,97 @@
-from flask import Flask, request, jsonify, send_file
-import overpy
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
+import overpass_client as overpass
 import geopandas as gpd
 import pandas as pd
-from shapely.geometry import Point, Polygon
+from shapely.geometry import Point
 import folium
 import matplotlib.pyplot as plt
 import os
 import matplotlib
 import plotly.express as px
+import base64
+import binascii
+import hashlib
+import threading
+import numpy as np
+import shapely
+from geo import haversine_m
+from search_cache import SearchCache, SearchResult
+from osm_categories import categories  # used in /process endpoint
+from osm_geometry import build_geometries
 
 matplotlib.use('Agg')  # Use non-interactive backend for Matplotlib
 
 # Initialize Flask
 app = Flask(__name__)
 
-# Initialize Overpass API
-api = overpy.Overpass()
+# Normalized */search result sets, for pagination and re-use
+search_cache = SearchCache()
 
-# Define categories (used in /process endpoint)
-categories = {
-    "medical_tourism": [
-        '["amenity"="hospital"]',
-        '["amenity"="clinic"]',
-        '["amenity"="pharmacy"]',
-        '["amenity"="doctors"]',
-        '["leisure"="spa"]',
-        '["leisure"="fitness_centre"]',
-        '["emergency"="ambulance_station"]',
-        '["emergency"="fire_station"]',
-    ],
-    "mice": [
-        '["amenity"="conference_centre"]',
-        '["amenity"="exhibition_centre"]',
-        '["amenity"="events_venue"]',
-        '["amenity"="theatre"]',
-        '["amenity"="parking"]',
-        '["amenity"="wifi"]',
-        '["amenity"="charging_station"]',
-        '["amenity"="atm"]',
-        '["amenity"="bank"]',
-    ],
-    "destination_weddings": [
-        '["amenity"="place_of_worship"]',
-        '["amenity"="events_venue"]',
-        '["amenity"="toilets"]',
-        '["amenity"="parking"]',
-        '["leisure"="garden"]',
-        '["shop"="bridal"]',
-        '["shop"="gift"]',
-        '["shop"="florist"]',
-    ],
+# Recommendation ranking: each candidate scores
+#   distance * closeness to the city center (1 = center, 0 = farthest candidate)
+# + completeness * share of COMPLETENESS_TAGS it has
+# + category * weight of its kind (the value of its first CATEGORY_TAG_KEYS tag)
+# Profiles are keyed by /process category or */search item type.
+COMPLETENESS_TAGS = ("phone", "website", "stars", "opening_hours")
+CATEGORY_TAG_KEYS = ("tourism", "amenity", "historic", "aeroway", "leisure", "shop", "emergency")
+RANKING_TAGS = COMPLETENESS_TAGS + CATEGORY_TAG_KEYS
+DEFAULT_RANKING_WEIGHTS = {"distance": 0.5, "completeness": 0.3, "category": 0.2}
+RECOMMENDATION_PROFILES = {
+    "medical_tourism": {
+        "weights": {"distance": 0.4, "completeness": 0.3, "category": 0.3},
+        "categories": {"hospital": 1.0, "clinic": 0.8, "doctors": 0.6, "spa": 0.5, "pharmacy": 0.4,
+                       "fitness_centre": 0.3, "ambulance_station": 0.3, "fire_station": 0.1},
+    },
+    "mice": {
+        "weights": {"distance": 0.4, "completeness": 0.2, "category": 0.4},
+        "categories": {"conference_centre": 1.0, "exhibition_centre": 1.0, "events_venue": 0.9, "theatre": 0.6,
+                       "bank": 0.3, "atm": 0.2, "parking": 0.2, "wifi": 0.2, "charging_station": 0.2},
+    },
+    "destination_weddings": {
+        "weights": {"distance": 0.3, "completeness": 0.3, "category": 0.4},
+        "categories": {"events_venue": 1.0, "place_of_worship": 0.9, "garden": 0.8, "bridal": 0.7,
+                       "florist": 0.6, "gift": 0.4, "parking": 0.2, "toilets": 0.1},
+    },
+    "Hotel": {
+        "weights": {"distance": 0.4, "completeness": 0.4, "category": 0.2},
+        "categories": {"hotel": 1.0, "guest_house": 0.7, "motel": 0.6, "hostel": 0.5},
+    },
+    "Sightseeing": {
+        "weights": {"distance": 0.4, "completeness": 0.2, "category": 0.4},
+        "categories": {"attraction": 1.0, "museum": 0.9, "monument": 0.8, "theme_park": 0.8, "zoo": 0.8,
+                       "archaeological_site": 0.7, "gallery": 0.7, "arts_centre": 0.6, "cinema": 0.4},
+    },
+    "Airport/Airfield": {
+        "weights": {"distance": 0.5, "completeness": 0.1, "category": 0.4},
+        "categories": {"airport": 1.0, "aerodrome": 0.9, "helipad": 0.3},
+    },
+    "Airline": {
+        "weights": {"distance": 0.6, "completeness": 0.4, "category": 0.0},
+        "categories": {},
+    },
+    "Medical Facility": {
+        "weights": {"distance": 0.4, "completeness": 0.3, "category": 0.3},
+        "categories": {"hospital": 1.0, "clinic": 0.8, "doctors": 0.6, "pharmacy": 0.4},
+    },
+    "MICE Venue": {
+        "weights": {"distance": 0.4, "completeness": 0.2, "category": 0.4},
+        "categories": {"conference_centre": 1.0, "exhibition_centre": 1.0, "events_venue": 0.9, "theatre": 0.6,
+                       "bank": 0.3, "atm": 0.2, "parking": 0.2, "wifi": 0.2, "charging_station": 0.2},
+    },
+}
+
+# Overpass output profiles (see overpass_client): /process needs full
+# geometry, the search and details handlers only centers and these tags
+DETAIL_TAGS = ("name", "name:en", "addr:", "contact:", "operator", "brand", "description",
+               "email", "wheelchair", "internet_access", "capacity")
+PROCESS_PROFILE = overpass.profile("geometry", ("name", "type") + RANKING_TAGS)
+SEARCH_PROFILES = {
+    "hotels": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS + ("rooms", "beds")),
+    "sightseeing": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS + ("heritage", "wikipedia", "fee")),
+    "airports": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS + ("iata", "icao", "aerodrome", "aerodrome:type")),
+    "airlines": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS + ("iata", "icao", "office")),
+    "medical": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS + ("healthcare", "healthcare:", "beds")),
+    "mice": overpass.profile("center", DETAIL_TAGS + RANKING_TAGS),
 }
 
 # Create output directory if not exists
@@ -82,12 +124,9 @@ def fetch_overpass_data(center_point, radius, tags):
           way{tag}(around:{radius},{lat},{lon});
           relation{tag}(around:{radius},{lat},{lon});
         );
-        out body;
-        >;
-        out skel qt;
         """
         try:
-            result = api.query(query)
+            result = overpass.query(query, PROCESS_PROFILE)
             results.append(result)
         except Exception as e:
             print(f"Error fetching data for tag {tag}: {e}")
@@ -96,49 +135,101 @@ def fetch_overpass_data(center_point, radius, tags):
 def process_results(results, category):
     """
     Process Overpass results into a GeoDataFrame.
-    Only includes features with a valid geometry.
+    Nodes become points; ways and multipolygon relations get the geometries
+    assembled by build_geometries. Elements without a geometry are dropped.
     """
     points = []
     for result in results:
         for node in result.nodes:
-            geom = Point(float(node.lon), float(node.lat))
-            # Only add if geometry is valid
-            if geom is not None:
+            # Untagged nodes are only the geometry of ways
+            if not node.tags:
+                continue
+            completeness, kind = tag_features(node.tags)
+            points.append({
+                "name": node.tags.get("name", "Unnamed Location"),
+                "category": category,
+                "kind": kind,
+                "completeness": completeness,
+                "geometry": Point(float(node.lon), float(node.lat)),
+            })
+        geometries = build_geometries(result)
+        for elements, built in ((result.ways, geometries["way"]), (result.relations, geometries["relation"])):
+            for element, geom in zip(elements, built.geometries):
+                if geom is None or not element.tags:
+                    continue
+                completeness, kind = tag_features(element.tags)
                 points.append({
-                    "name": node.tags.get("name", "Unnamed Location"),
+                    "name": element.tags.get("name", "Unnamed Location"),
                     "category": category,
+                    "kind": kind,
+                    "completeness": completeness,
                     "geometry": geom,
                 })
-        for way in result.ways:
-            try:
-                pts = [(float(n.lon), float(n.lat)) for n in way.nodes]
-                geom = Polygon(pts) if len(pts) > 2 else None
-                if geom is not None:
-                    points.append({
-                        "name": way.tags.get("name", "Unnamed Location"),
-                        "category": category,
-                        "geometry": geom,
-                    })
-            except Exception as e:
-                print(f"Skipping way {way.id}: {e}")
-    # Filter out any items without a valid geometry (defensive creation)
-    valid_points = [pt for pt in points if pt.get("geometry") is not None]
-    return gpd.GeoDataFrame(valid_points, crs="EPSG:4326")
+    return gpd.GeoDataFrame(points, crs="EPSG:4326")
+
+def tag_features(tags):
+    """ (completeness, kind) of an OSM tag dict, as used for ranking. """
+    completeness = sum(1 for key in COMPLETENESS_TAGS if tags.get(key)) / len(COMPLETENESS_TAGS)
+    kind = next((tags[key] for key in CATEGORY_TAG_KEYS if key in tags), None)
+    return completeness, kind
 
-def generate_recommendations(gdf, category):
+def rank_candidates(profile_name, center, lats, lons, completeness, kinds, k=5):
     """
-    Generate recommendations from a GeoDataFrame.
+    Score candidates with the profile's weights and return
+    (indices of the k best, best first; distances in metres).
+    """
+    profile = RECOMMENDATION_PROFILES.get(profile_name, {})
+    weights = profile.get("weights", DEFAULT_RANKING_WEIGHTS)
+    categories = profile.get("categories", {})
+
+    if center is None:
+        distances = np.full(len(kinds), np.nan)
+    else:
+        with np.errstate(invalid='ignore'):
+            distances = haversine_m(center[0], center[1], lats, lons)
+    known = np.isfinite(distances)
+    farthest = distances[known].max() if known.any() else 0.0
+    closeness = np.zeros(len(kinds))
+    if farthest > 0:
+        closeness[known] = 1 - distances[known] / farthest
+    else:
+        closeness[known] = 1.0
+
+    scores = (weights["distance"] * closeness
+              + weights["completeness"] * np.asarray(completeness, dtype=np.float64)
+              + weights["category"] * np.array([categories.get(kind, 0.0) for kind in kinds]))
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.intp), distances
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')], distances
+
+def distance_km(distances, i):
+    return round(float(distances[i]) / 1000, 2) if np.isfinite(distances[i]) else None
+
+def generate_recommendations(gdf, category, center=None):
+    """
+    Generate recommendations from a GeoDataFrame, ranked by distance from
+    `center` (lat, lon), tag completeness and kind (see RECOMMENDATION_PROFILES).
     """
     recommendations = []
     if not gdf.empty:
         df_named = gdf[gdf['name'] != "Unnamed Location"]
-        df_sorted = df_named.sort_values(by="name")
-        for _, row in df_sorted.head(5).iterrows():
-            recommendations.append({
-                "name": row["name"],
-                "category": row.get("category", category),
-                "description": f"Highly recommended {category} spot: {row['name']}."
-            })
+        if not df_named.empty:
+            centroids = shapely.centroid(np.asarray(df_named.geometry.values))
+            top, distances = rank_candidates(
+                category, center,
+                shapely.get_y(centroids), shapely.get_x(centroids),
+                df_named["completeness"].to_numpy(), df_named["kind"].tolist()
+            )
+            names = df_named["name"].to_numpy()
+            for i in top:
+                recommendations.append({
+                    "name": names[i],
+                    "category": category,
+                    "distance_km": distance_km(distances, i),
+                    "description": f"Highly recommended {category} spot: {names[i]}."
+                })
     if not recommendations:
         recommendations.append({
             "name": "No recommendations available",
@@ -147,19 +238,30 @@ def generate_recommendations(gdf, category):
         })
     return recommendations
 
-def generate_recommendations_from_list(data_list, item_type):
+def generate_recommendations_from_list(data_list, item_type, center=None):
     """
-    Generate recommendations from a list of dictionaries.
+    Generate recommendations from a list of dictionaries with "name", "lat",
+    "lon" and "tags", ranked like generate_recommendations.
     """
     recommendations = []
     filtered = [item for item in data_list if item.get("name") not in [None, "N/A", "Unnamed Location"]]
-    filtered.sort(key=lambda x: x["name"])
-    for item in filtered[:5]:
-        recommendations.append({
-            "name": item["name"],
-            "item_type": item_type,
-            "description": f"Recommended {item_type}: {item['name']}."
-        })
+    if filtered:
+        features = [tag_features(item.get("tags") or {}) for item in filtered]
+        top, distances = rank_candidates(
+            item_type, center,
+            [np.nan if item.get("lat") is None else item["lat"] for item in filtered],
+            [np.nan if item.get("lon") is None else item["lon"] for item in filtered],
+            [completeness for completeness, _ in features],
+            [kind for _, kind in features]
+        )
+        for i in top:
+            item = filtered[i]
+            recommendations.append({
+                "name": item["name"],
+                "item_type": item_type,
+                "distance_km": distance_km(distances, i),
+                "description": f"Recommended {item_type}: {item['name']}."
+            })
     if not recommendations:
         recommendations.append({
             "name": "No recommendations available",
@@ -206,6 +308,8 @@ def process_data():
     tags = categories[category]
     center_point = (lat, lon)
     results = fetch_overpass_data(center_point, radius, tags)
+    if not results:
+        return overpass_unavailable()
     gdf = process_results(results, category)
     if gdf.empty:
         return jsonify({"error": "No data found"}), 404
@@ -226,18 +330,13 @@ def process_data():
     plt.close(fig)
     map_file = os.path.join(output_dir, f"{category}_{city_name}_map.html")
     m = folium.Map(location=[lat, lon], zoom_start=12)
-    # When creating the map GeoDataFrame, filter out items without valid geometry:
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} for feat in [
-        {"name": row["name"], "geometry": row["geometry"]} for row in gdf.itertuples(index=False)
-    ] if feat.get("geometry") is not None]
-    # (Alternatively, our gdf already contains valid geometries.)
     for _, row in gdf.iterrows():
         if row.geometry:
             if isinstance(row.geometry, Point):
                 folium.Marker(location=(row.geometry.y, row.geometry.x),
                               popup=row["name"],
                               tooltip=category.capitalize()).add_to(m)
-            elif isinstance(row.geometry, Polygon):
+            else:
                 folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
     m.save(map_file)
     try:
@@ -245,7 +344,7 @@ def process_data():
             html_content = file.read()
     except Exception:
         html_content = None
-    recs = generate_recommendations(gdf, category)
+    recs = generate_recommendations(gdf, category, center_point)
     return jsonify({
         "csv_file": csv_file,
         "geojson_file": geojson_file,
@@ -263,30 +362,168 @@ def download_file():
     return send_file(file_path, as_attachment=True)
 
 # ---------------------------
-# HOTEL ENDPOINTS
+# Search Helpers (shared by the */search endpoints)
 # ---------------------------
-def fetch_hotels_overpy(lat, lon, radius=20000):
-    query = f"""
-    (
-      node["tourism"="hotel"](around:{radius},{lat},{lon});
-      node["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
-      way["tourism"="hotel"](around:{radius},{lat},{lon});
-      way["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
-      relation["tourism"="hotel"](around:{radius},{lat},{lon});
-      relation["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
-    );
-    out center;
-    >;
-    out skel qt;
+NDJSON_MIMETYPE = "application/x-ndjson"
+MAX_PAGE_SIZE = 1000
+
+def result_fingerprint(items, id_key):
+    """ Short hash of a result set's item ids; cursors carry it so they only page that set. """
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(f"{item.get(id_key)}\0".encode())
+    return digest.hexdigest()[:16]
+
+def encode_cursor(offset, fingerprint):
+    return base64.urlsafe_b64encode(f"{offset}:{fingerprint}".encode()).decode()
+
+def decode_cursor(cursor):
+    """ (offset, result fingerprint) of a pagination cursor; raises ValueError if malformed. """
+    try:
+        offset, fingerprint = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if offset < 0 or not fingerprint:
+        raise ValueError("Invalid cursor")
+    return offset, fingerprint
+
+def overpass_unavailable():
+    """ 503 for a request whose Overpass queries failed on every mirror. """
+    response = jsonify({"status": "error", "message": "Map data service is unavailable, please retry shortly."})
+    response.headers["Retry-After"] = "30"
+    return response, 503
+
+def project(item, fields):
+    """ Keep only the requested fields of an item (all of them if fields is None). """
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+def iter_osm_items(osm_result, id_key):
+    """
+    Yield one normalized item per tagged Overpass element (nodes, then ways
+    and relations at their center, as floats rather than Decimals). Ways and
+    relations without a center fall back to the centroid of their geometry.
+    Untagged elements are only the geometry of others and are skipped.
+    """
+    for node in osm_result.nodes:
+        if not node.tags:
+            continue
+        yield {
+            id_key: f"node/{node.id}",
+            "name": node.tags.get("name", "N/A"),
+            "lat": float(node.lat),
+            "lon": float(node.lon),
+            "tags": dict(node.tags)
+        }
+    geometries = None
+    for kind, elements in (("way", osm_result.ways), ("relation", osm_result.relations)):
+        for i, element in enumerate(elements):
+            if not element.tags:
+                continue
+            if element.center_lat is not None and element.center_lon is not None:
+                lat, lon = float(element.center_lat), float(element.center_lon)
+            else:
+                if geometries is None:
+                    geometries = build_geometries(osm_result)
+                lat, lon = geometries[kind].lats[i], geometries[kind].lons[i]
+                lat, lon = (None, None) if np.isnan(lat) else (float(lat), float(lon))
+            yield {
+                id_key: f"{kind}/{element.id}",
+                "name": element.tags.get("name", "N/A"),
+                "lat": lat,
+                "lon": lon,
+                "tags": dict(element.tags)
+            }
+
+def stream_osm_items(elements, id_key):
+    """
+    Like iter_osm_items, over the elements of overpass.stream as they arrive.
+    The search profiles ask Overpass for centers, so there is no geometry to
+    fall back on: a way or relation without a center gets no coordinates.
+    """
+    for element in elements:
+        if not element.tags:
+            continue
+        if isinstance(element, overpass.Node):
+            kind, lat, lon = "node", element.lat, element.lon
+        else:
+            kind = "way" if isinstance(element, overpass.Way) else "relation"
+            lat, lon = element.center_lat, element.center_lon
+        located = lat is not None and lon is not None
+        yield {
+            id_key: f"{kind}/{element.id}",
+            "name": element.tags.get("name", "N/A"),
+            "lat": float(lat) if located else None,
+            "lon": float(lon) if located else None,
+            "tags": dict(element.tags)
+        }
+
+def build_search_map(domain, place, lat, lon, radius, items, tooltip):
+    """
+    Render the Folium map for a search and return (map_file, map_html).
+    `items` only needs "name", "lat" and "lon". Each radius gets its own
+    file, so a result cut from a larger cached one does not overwrite its map.
     """
+    map_file = os.path.join(output_dir, f"{domain}_map_{place}_{radius}.html")
+    m = folium.Map(location=[lat, lon], zoom_start=12)
+    for item in items:
+        if item["lat"] and item["lon"]:
+            folium.Marker(location=(item["lat"], item["lon"]),
+                          popup=item["name"],
+                          tooltip=tooltip).add_to(m)
+    # Rendered under a private name, so concurrent searches never interleave writes
+    tmp_file = f"{map_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    m.save(tmp_file)
     try:
-        return api.query(query)
-    except Exception as e:
-        print(f"Error fetching hotel data: {e}")
+        with open(tmp_file, 'r', encoding='utf-8') as f:
+            map_html = f.read()
+    except Exception:
+        map_html = None
+    os.replace(tmp_file, map_file)
+    return map_file, map_html
+
+def cached_search(domain, place, lat, lon, radius, item_type):
+    """
+    Cached result set for a search, or None. A search that fits inside an
+    already cached (larger) one is cut from it locally, so moving the radius
+    slider down costs a filter instead of a new Overpass query.
+    """
+    result = search_cache.get(domain, lat, lon, radius)
+    if result is not None:
+        return result
+    within = search_cache.get_within(domain, lat, lon, radius)
+    if within is None:
         return None
+    items, stored_at = within
+    map_file, map_html = build_search_map(domain, place, lat, lon, radius, items, item_type)
+    recs = generate_recommendations_from_list(items, item_type, (lat, lon))
+    return search_cache.put(domain, lat, lon, radius, SearchResult(items, map_file, map_html, recs),
+                            stored_at=stored_at)
 
-@app.route('/hotels/search', methods=['GET'])
-def hotels_search():
+def search_response(fetch, id_key, domain, item_type):
+    """
+    Run a */search request: resolve the place, query Overpass, normalize the
+    elements, render the map and build recommendations.
+
+    The result set is cached, and optional query args cut it down:
+      limit=N    : return at most N items plus a `next_cursor` for the rest
+      cursor=... : continue from a previous page's `next_cursor`; if the
+                   result set has changed since (refetched after eviction
+                   or expiry), the request fails with 409 and paging must
+                   restart from the first page
+      fields=a,b : return only these item fields (e.g. hotel_id,name,lat,lon)
+    map_content is only sent with the first page.
+
+    With `Accept: application/x-ndjson` the response is streamed: one
+    {"type": "feature", ...} line per element as soon as it is read off the
+    Overpass response, then a {"type": "trailer", ...} line with the count,
+    recommendations and the map artifact (fetch it through /download). Only
+    the name, coordinates and ranking tags of each element are kept for the
+    trailer, not the full list. If Overpass fails mid-response, the stream
+    ends with a {"type": "trailer", "status": "error"} line.
+    """
     city = request.args.get('city', '').strip()
     country = request.args.get('country', '').strip()
     radius = request.args.get('radius', 20000)
@@ -295,7 +532,21 @@ def hotels_search():
     except ValueError:
         return jsonify({"status": "error", "message": "Invalid radius value"}), 400
     if not city and not country:
-        return jsonify({"status": "error", "message": "Please provide at least city or country."}), 400
+        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')
+    try:
+        limit = int(limit) if limit else None
+        if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return jsonify({"status": "error", "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    try:
+        offset, fingerprint = decode_cursor(cursor) if cursor else (0, None)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
     place_filter = True
     if city:
         place_filter &= (cities_data['City'] == city)
@@ -306,80 +557,102 @@ def hotels_search():
         return jsonify({"status": "error", "message": "No matching city/country found"}), 404
     lat = matched_places.iloc[0]['Latitude']
     lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_hotels_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    hotels_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        hotel_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        hotels_list.append({
-            "hotel_id": hotel_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        hotel_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        hotels_list.append({
-            "hotel_id": hotel_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        hotel_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        hotels_list.append({
-            "hotel_id": hotel_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    # Defensive creation: only include features with valid geometry
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"hotels_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="Hotel").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(hotels_list, "Hotel")
-    return jsonify({
+    place = city or country
+    stream = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+    result = cached_search(domain, place, lat, lon, radius, item_type)
+
+    if stream:
+        # Streams straight from Overpass on a miss, each element sent as soon
+        # as it is parsed; the full list is never held in memory, so a
+        # streamed search does not fill the cache. Failures before the first
+        # byte still get a 503, later ones end the stream with an error trailer.
+        elements = None if result else fetch(lat, lon, radius, stream=True)
+        if not result and elements is None:
+            return overpass_unavailable()
+
+        def generate():
+            if result:
+                for item in result.items:
+                    yield app.json.dumps({"type": "feature", "data": project(item, fields)}) + "\n"
+                trailer = {"type": "trailer", "status": "success", "count": len(result.items),
+                           "map_file": result.map_file, "recommendations": result.recommendations}
+                yield app.json.dumps(trailer) + "\n"
+                return
+            points = []
+            try:
+                for item in stream_osm_items(elements, id_key):
+                    tags = item["tags"]
+                    points.append({"name": item["name"], "lat": item["lat"], "lon": item["lon"],
+                                   "tags": {key: tags[key] for key in RANKING_TAGS if key in tags}})
+                    yield app.json.dumps({"type": "feature", "data": project(item, fields)}) + "\n"
+            except Exception as e:
+                print(f"Overpass stream for {domain} search failed: {e}")
+                trailer = {"type": "trailer", "status": "error", "count": len(points),
+                           "message": "Map data service failed mid-response, please retry."}
+                yield app.json.dumps(trailer) + "\n"
+                return
+            trailer = {"type": "trailer", "status": "success", "count": len(points)}
+            if points:
+                map_file, _ = build_search_map(domain, place, lat, lon, radius, points, item_type)
+                trailer["map_file"] = map_file
+                trailer["recommendations"] = generate_recommendations_from_list(points, item_type, (lat, lon))
+            else:
+                trailer["recommendations"] = []
+            yield app.json.dumps(trailer) + "\n"
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+    if result is None:
+        osm_result = fetch(lat, lon, radius)
+        if osm_result is None:
+            return overpass_unavailable()
+        items = list(iter_osm_items(osm_result, id_key))
+        map_file, map_html = build_search_map(domain, place, lat, lon, radius, items, item_type)
+        recs = generate_recommendations_from_list(items, item_type, (lat, lon))
+        result = search_cache.put(domain, lat, lon, radius, SearchResult(items, map_file, map_html, recs))
+
+    current = result_fingerprint(result.items, id_key)
+    if fingerprint is not None and fingerprint != current:
+        return jsonify({"status": "error",
+                        "message": "Search results have changed, restart from the first page."}), 409
+    end = len(result.items) if limit is None else offset + limit
+    page = result.items[offset:end]
+    response = {
         "status": "success",
-        "count": len(hotels_list),
-        "data": hotels_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+        "count": len(result.items),
+        "data": [project(item, fields) for item in page],
+        "map_file": result.map_file,
+        "recommendations": result.recommendations
+    }
+    if offset == 0:
+        response["map_content"] = result.map_html
+    if end < len(result.items):
+        response["next_cursor"] = encode_cursor(end, current)
+    return jsonify(response)
+
+# ---------------------------
+# HOTEL ENDPOINTS
+# ---------------------------
+def fetch_hotels_overpy(lat, lon, radius=20000, stream=False):
+    query = f"""
+    (
+      node["tourism"="hotel"](around:{radius},{lat},{lon});
+      node["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
+      way["tourism"="hotel"](around:{radius},{lat},{lon});
+      way["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
+      relation["tourism"="hotel"](around:{radius},{lat},{lon});
+      relation["amenity"~"^(hotel|motel|guest_house|hostel)$"](around:{radius},{lat},{lon});
+    );
+    """
+    try:
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["hotels"])
+    except Exception as e:
+        print(f"Error fetching hotel data: {e}")
+        return None
+
+@app.route('/hotels/search', methods=['GET'])
+def hotels_search():
+    return search_response(fetch_hotels_overpy, "hotel_id", "hotels", "Hotel")
 
 @app.route('/hotels/details/<path:hotel_id>', methods=['GET'])
 def hotels_details(hotel_id):
@@ -403,8 +676,8 @@ def hotels_details(hotel_id):
     lat = matched_places.iloc[0]['Latitude']
     lon = matched_places.iloc[0]['Longitude']
     osm_result = fetch_hotels_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "error", "message": "Hotel not found"}), 404
+    if osm_result is None:
+        return overpass_unavailable()
     try:
         h_type, h_osm_id = hotel_id.split('/')
         h_osm_id = int(h_osm_id)
@@ -483,7 +756,7 @@ def hotels_cancel():
 # ---------------------------
 # SIGHTSEEING ENDPOINTS
 # ---------------------------
-def fetch_sightseeing_overpy(lat, lon, radius=20000):
+def fetch_sightseeing_overpy(lat, lon, radius=20000, stream=False):
     query = f"""
     (
       node["tourism"~"^(attraction|museum|theme_park|zoo)$"](around:{radius},{lat},{lon});
@@ -496,111 +769,16 @@ def fetch_sightseeing_overpy(lat, lon, radius=20000):
       relation["amenity"~"^(arts_centre|gallery|cinema)$"](around:{radius},{lat},{lon});
       relation["historic"~"^(monument|archaeological_site)$"](around:{radius},{lat},{lon});
     );
-    out center;
-    >;
-    out skel qt;
     """
     try:
-        return api.query(query)
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["sightseeing"])
     except Exception as e:
         print(f"Error fetching sightseeing data: {e}")
         return None
 
 @app.route('/sightseeing/search', methods=['GET'])
 def sightseeing_search():
-    city = request.args.get('city', '').strip()
-    country = request.args.get('country', '').strip()
-    radius = request.args.get('radius', 20000)
-    try:
-        radius = int(radius)
-    except ValueError:
-        return jsonify({"status": "error", "message": "Invalid radius value"}), 400
-    if not city and not country:
-        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
-    place_filter = True
-    if city:
-        place_filter &= (cities_data['City'] == city)
-    if country:
-        place_filter &= (cities_data['Country'] == country)
-    matched_places = cities_data[place_filter]
-    if matched_places.empty:
-        return jsonify({"status": "error", "message": "No matching city/country found"}), 404
-    lat = matched_places.iloc[0]['Latitude']
-    lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_sightseeing_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    sightseeing_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        item_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        sightseeing_list.append({
-            "sightseeing_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        item_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        sightseeing_list.append({
-            "sightseeing_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        item_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        sightseeing_list.append({
-            "sightseeing_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    # Defensive creation: include only features with valid geometry
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"sightseeing_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="Sightseeing").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(sightseeing_list, "Sightseeing")
-    return jsonify({
-        "status": "success",
-        "count": len(sightseeing_list),
-        "data": sightseeing_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+    return search_response(fetch_sightseeing_overpy, "sightseeing_id", "sightseeing", "Sightseeing")
 
 @app.route('/sightseeing/details/<path:sightseeing_id>', methods=['GET'])
 def sightseeing_details(sightseeing_id):
@@ -624,8 +802,8 @@ def sightseeing_details(sightseeing_id):
     lat = matched_places.iloc[0]['Latitude']
     lon = matched_places.iloc[0]['Longitude']
     osm_result = fetch_sightseeing_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "error", "message": "Sightseeing spot not found"}), 404
+    if osm_result is None:
+        return overpass_unavailable()
     try:
         s_type, s_osm_id = sightseeing_id.split('/')
         s_osm_id = int(s_osm_id)
@@ -704,7 +882,7 @@ def sightseeing_cancel():
 # ---------------------------
 # AIRPORT ENDPOINTS
 # ---------------------------
-def fetch_airports_overpy(lat, lon, radius=20000):
+def fetch_airports_overpy(lat, lon, radius=20000, stream=False):
     query = f"""
     (
       node["aeroway"="airport"](around:{radius},{lat},{lon});
@@ -717,111 +895,16 @@ def fetch_airports_overpy(lat, lon, radius=20000):
       way["aeroway"="aerodrome"](around:{radius},{lat},{lon});
       relation["aeroway"="aerodrome"](around:{radius},{lat},{lon});
     );
-    out center;
-    >;
-    out skel qt;
     """
     try:
-        return api.query(query)
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["airports"])
     except Exception as e:
         print(f"Error fetching airport data: {e}")
         return None
 
 @app.route('/airports/search', methods=['GET'])
 def airports_search():
-    city = request.args.get('city', '').strip()
-    country = request.args.get('country', '').strip()
-    radius = request.args.get('radius', 20000)
-    try:
-        radius = int(radius)
-    except ValueError:
-        return jsonify({"status": "error", "message": "Invalid radius value"}), 400
-    if not city and not country:
-        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
-    place_filter = True
-    if city:
-        place_filter &= (cities_data['City'] == city)
-    if country:
-        place_filter &= (cities_data['Country'] == country)
-    matched_places = cities_data[place_filter]
-    if matched_places.empty:
-        return jsonify({"status": "error", "message": "No matching city/country found"}), 404
-    lat = matched_places.iloc[0]['Latitude']
-    lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_airports_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    airports_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        item_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        airports_list.append({
-            "airport_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        item_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        airports_list.append({
-            "airport_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        item_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        airports_list.append({
-            "airport_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    # Defensive creation: only include features with valid geometry
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"airports_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="Airport/Airfield").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(airports_list, "Airport/Airfield")
-    return jsonify({
-        "status": "success",
-        "count": len(airports_list),
-        "data": airports_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+    return search_response(fetch_airports_overpy, "airport_id", "airports", "Airport/Airfield")
 
 @app.route('/airports/details/<path:airport_id>', methods=['GET'])
 def airports_details(airport_id):
@@ -845,8 +928,8 @@ def airports_details(airport_id):
     lat = matched_places.iloc[0]['Latitude']
     lon = matched_places.iloc[0]['Longitude']
     osm_result = fetch_airports_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "error", "message": "Airport/Airfield not found"}), 404
+    if osm_result is None:
+        return overpass_unavailable()
     try:
         a_type, a_osm_id = airport_id.split('/')
         a_osm_id = int(a_osm_id)
@@ -901,7 +984,7 @@ def airports_details(airport_id):
 # ---------------------------
 # AIRLINE ENDPOINTS
 # ---------------------------
-def fetch_airlines_overpy(lat, lon, radius=20000):
+def fetch_airlines_overpy(lat, lon, radius=20000, stream=False):
     query = f"""
     (
       node["operator"~"Airlines", i](around:{radius},{lat},{lon});
@@ -911,110 +994,16 @@ def fetch_airlines_overpy(lat, lon, radius=20000):
       way["name"~"Airlines", i](around:{radius},{lat},{lon});
       relation["name"~"Airlines", i](around:{radius},{lat},{lon});
     );
-    out center;
-    >;
-    out skel qt;
     """
     try:
-        return api.query(query)
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["airlines"])
     except Exception as e:
         print(f"Error fetching airline data: {e}")
         return None
 
 @app.route('/airlines/search', methods=['GET'])
 def airlines_search():
-    city = request.args.get('city', '').strip()
-    country = request.args.get('country', '').strip()
-    radius = request.args.get('radius', 20000)
-    try:
-        radius = int(radius)
-    except ValueError:
-        return jsonify({"status": "error", "message": "Invalid radius value"}), 400
-    if not city and not country:
-        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
-    place_filter = True
-    if city:
-        place_filter &= (cities_data['City'] == city)
-    if country:
-        place_filter &= (cities_data['Country'] == country)
-    matched_places = cities_data[place_filter]
-    if matched_places.empty:
-        return jsonify({"status": "error", "message": "No matching city/country found"}), 404
-    lat = matched_places.iloc[0]['Latitude']
-    lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_airlines_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    airlines_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        item_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        airlines_list.append({
-            "airline_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        item_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        airlines_list.append({
-            "airline_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        item_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        airlines_list.append({
-            "airline_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"airlines_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="Airline").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(airlines_list, "Airline")
-    return jsonify({
-        "status": "success",
-        "count": len(airlines_list),
-        "data": airlines_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+    return search_response(fetch_airlines_overpy, "airline_id", "airlines", "Airline")
 
 @app.route('/airlines/details/<path:airline_id>', methods=['GET'])
 def airlines_details(airline_id):
@@ -1038,8 +1027,8 @@ def airlines_details(airline_id):
     lat = matched_places.iloc[0]['Latitude']
     lon = matched_places.iloc[0]['Longitude']
     osm_result = fetch_airlines_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "error", "message": "Airline not found"}), 404
+    if osm_result is None:
+        return overpass_unavailable()
     try:
         a_type, a_osm_id = airline_id.split('/')
         a_osm_id = int(a_osm_id)
@@ -1118,7 +1107,7 @@ def airlines_cancel():
 # ---------------------------
 # MEDICAL TOURISM ENDPOINTS
 # ---------------------------
-def fetch_medical_overpy(lat, lon, radius=20000):
+def fetch_medical_overpy(lat, lon, radius=20000, stream=False):
     query = f"""
     (
       node["amenity"="hospital"](around:{radius},{lat},{lon});
@@ -1134,115 +1123,21 @@ def fetch_medical_overpy(lat, lon, radius=20000):
       relation["amenity"="doctors"](around:{radius},{lat},{lon});
       relation["amenity"="pharmacy"](around:{radius},{lat},{lon});
     );
-    out center;
-    >;
-    out skel qt;
     """
     try:
-        return api.query(query)
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["medical"])
     except Exception as e:
         print(f"Error fetching medical data: {e}")
         return None
 
 @app.route('/medical/search', methods=['GET'])
 def medical_search():
-    city = request.args.get('city', '').strip()
-    country = request.args.get('country', '').strip()
-    radius = request.args.get('radius', 20000)
-    try:
-        radius = int(radius)
-    except ValueError:
-        return jsonify({"status": "error", "message": "Invalid radius value"}), 400
-    if not city and not country:
-        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
-    place_filter = True
-    if city:
-        place_filter &= (cities_data['City'] == city)
-    if country:
-        place_filter &= (cities_data['Country'] == country)
-    matched_places = cities_data[place_filter]
-    if matched_places.empty:
-        return jsonify({"status": "error", "message": "No matching city/country found"}), 404
-    lat = matched_places.iloc[0]['Latitude']
-    lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_medical_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    medical_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        item_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        medical_list.append({
-            "medical_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        item_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        medical_list.append({
-            "medical_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        item_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        medical_list.append({
-            "medical_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"medical_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="Medical Facility").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(medical_list, "Medical Facility")
-    return jsonify({
-        "status": "success",
-        "count": len(medical_list),
-        "data": medical_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+    return search_response(fetch_medical_overpy, "medical_id", "medical", "Medical Facility")
 
 # ---------------------------
 # MICE ENDPOINTS
 # ---------------------------
-def fetch_mice_overpy(lat, lon, radius=20000):
+def fetch_mice_overpy(lat, lon, radius=20000, stream=False):
     query = f"""
     (
       node["amenity"="conference_centre"](around:{radius},{lat},{lon});
@@ -1273,110 +1168,16 @@ def fetch_mice_overpy(lat, lon, radius=20000):
       relation["amenity"="atm"](around:{radius},{lat},{lon});
       relation["amenity"="bank"](around:{radius},{lat},{lon});
     );
-    out center;
-    >;
-    out skel qt;
     """
     try:
-        return api.query(query)
+        return (overpass.stream if stream else overpass.query)(query, SEARCH_PROFILES["mice"])
     except Exception as e:
         print(f"Error fetching MICE data: {e}")
         return None
 
 @app.route('/mice/search', methods=['GET'])
 def mice_search():
-    city = request.args.get('city', '').strip()
-    country = request.args.get('country', '').strip()
-    radius = request.args.get('radius', 20000)
-    try:
-        radius = int(radius)
-    except ValueError:
-        return jsonify({"status": "error", "message": "Invalid radius value"}), 400
-    if not city and not country:
-        return jsonify({"status": "error", "message": "Provide at least city or country."}), 400
-    place_filter = True
-    if city:
-        place_filter &= (cities_data['City'] == city)
-    if country:
-        place_filter &= (cities_data['Country'] == country)
-    matched_places = cities_data[place_filter]
-    if matched_places.empty:
-        return jsonify({"status": "error", "message": "No matching city/country found"}), 404
-    lat = matched_places.iloc[0]['Latitude']
-    lon = matched_places.iloc[0]['Longitude']
-    osm_result = fetch_mice_overpy(lat, lon, radius)
-    if not osm_result:
-        return jsonify({"status": "success", "count": 0, "data": []}), 200
-    mice_list = []
-    geo_features = []
-    for node in osm_result.nodes:
-        item_id = f"node/{node.id}"
-        name = node.tags.get("name", "N/A")
-        lat_ = float(node.lat)
-        lon_ = float(node.lon)
-        mice_list.append({
-            "mice_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(node.tags)
-        })
-        geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for way in osm_result.ways:
-        item_id = f"way/{way.id}"
-        name = way.tags.get("name", "N/A")
-        lat_ = way.center_lat if hasattr(way, 'center_lat') and way.center_lat else None
-        lon_ = way.center_lon if hasattr(way, 'center_lon') and way.center_lon else None
-        mice_list.append({
-            "mice_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(way.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    for rel in osm_result.relations:
-        item_id = f"relation/{rel.id}"
-        name = rel.tags.get("name", "N/A")
-        lat_ = rel.center_lat if hasattr(rel, 'center_lat') and rel.center_lat else None
-        lon_ = rel.center_lon if hasattr(rel, 'center_lon') and rel.center_lon else None
-        mice_list.append({
-            "mice_id": item_id,
-            "name": name,
-            "lat": lat_,
-            "lon": lon_,
-            "tags": dict(rel.tags)
-        })
-        if lat_ and lon_:
-            geo_features.append({"name": name, "geometry": Point(lon_, lat_)})
-    gdf_data = [{"name": feat["name"], "geometry": feat["geometry"]} 
-                for feat in geo_features if feat.get("geometry") is not None]
-    gdf = gpd.GeoDataFrame(gdf_data, crs="EPSG:4326")
-    map_file = os.path.join(output_dir, f"mice_map_{city or country}.html")
-    m = folium.Map(location=[lat, lon], zoom_start=12)
-    for _, row in gdf.iterrows():
-        if isinstance(row.geometry, Point):
-            folium.Marker(location=(row.geometry.y, row.geometry.x),
-                          popup=row["name"],
-                          tooltip="MICE Venue").add_to(m)
-        elif isinstance(row.geometry, Polygon):
-            folium.GeoJson(row.geometry, name=row["name"]).add_to(m)
-    m.save(map_file)
-    try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            map_html = f.read()
-    except Exception:
-        map_html = None
-    recs = generate_recommendations_from_list(mice_list, "MICE Venue")
-    return jsonify({
-        "status": "success",
-        "count": len(mice_list),
-        "data": mice_list,
-        "map_file": map_file,
-        "map_content": map_html,
-        "recommendations": recs
-    })
+    return search_response(fetch_mice_overpy, "mice_id", "mice", "MICE Venue")
 
 # ---------------------------
 # Run the Application
@@ -0,0 +1,216 @@
+# batch_score.py
+"""
+Batch scoring job: retrain the KNN recommenders from the score model
+rankings and publish them to the running backends without a restart.
+
+For each recommender (medical, mice, wedding):
+  - its features are read from the Parquet rankings written by the score
+    models (models/AI-score-model/model); features a ranking lacks come
+    from another ranking, per country (the rankings' indicator columns are
+    country-level)
+  - the StandardScaler + cosine NearestNeighbors model is trained as in
+    the training notebook
+  - the artifacts are written to <model dir>/versions/<version>/ and the
+    model directory's CURRENT file is then repointed at it, atomically
+
+The backends watch CURRENT and swap the new version in by themselves (see
+hot_swap.py); `kill -HUP <pid>` makes a backend check at once. Only the
+newest --keep versions are kept.
+
+Each version records a hash of the data and settings it was trained from
+(SOURCE_FILE). When the assembled rankings hash the same as the served
+version, nothing is published: a swap would only reset the backends'
+version-keyed caches for an identical model.
+
+Nightly, e.g. from cron:
+    0 3 * * * cd Backend/services_backend && python batch_score.py --run-pipeline
+
+Usage:
+    python batch_score.py                      # every recommender
+    python batch_score.py mice --keep 5
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from artifacts import VERSIONS_DIR, current_model_path, publish_version, read_pointer, save_artifacts
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCORE_MODELS_DIR = os.path.normpath(os.path.join(HERE, '..', '..', 'models', 'AI-score-model', 'model'))
+
+# Weights of the standardized features in 'City Ranking Score'
+RANKING_WEIGHTS = [0.2, 0.2, 0.15, 0.15, 0.15, 0.15]
+# Hash of the training input, kept in each version directory
+SOURCE_FILE = 'source.sha1'
+
+RECOMMENDERS = {
+    'medical': {
+        'model_path': 'models',
+        'model_file': 'medical_tourism_model.pkl',
+        'rankings': ['enhanced_medical_tourism_analysis.parquet', 'mice_destination_ranking.parquet'],
+        'features': [
+            'Hospital Beds per 1,000',
+            'Health Spending per Capita (USD)',
+            'GDP per Capita (USD)',
+            'Tourist Arrivals per Year',
+            'Ease of Doing Business Score',
+            'Safety Index (Homicide Rate)'
+        ],
+        'score_column': 'Medical Tourism Score',
+    },
+    'mice': {
+        'model_path': 'models_mice',
+        'model_file': 'city_ranking_model.pkl',
+        'rankings': ['mice_destination_ranking.parquet'],
+        'features': [
+            'Ease of Doing Business Score',
+            'GDP per Capita (USD)',
+            'International Air Passengers',
+            'Tourist Arrivals',
+            'Safety Index (Homicide Rate)',
+            'MICE Score'
+        ],
+        'score_column': 'MICE Score',
+    },
+    'wedding': {
+        'model_path': 'models_wedding',
+        'model_file': 'wedding_ranking_model.pkl',
+        'rankings': ['destination_wedding_ranking.parquet'],
+        'features': [
+            'Ease of Business Score',
+            'GDP per Capita (USD)',
+            'International Air Passengers',
+            'Tourist Arrivals (millions)',
+            'Safety Index (Low Crime Rate)',
+            'Destination Wedding Score'
+        ],
+        'score_column': 'Destination Wedding Score',
+    },
+}
+
+
+def train(df, features):
+    """ Fit the scaler and KNN model on `df`. Returns (model, scaler, df, X_scaled). """
+    df = df.dropna(subset=['countrycode'] + features).reset_index(drop=True)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(df[features])
+    df['City Ranking Score'] = (X_scaled * RANKING_WEIGHTS).sum(axis=1)
+    model = NearestNeighbors(n_neighbors=5, metric='cosine', algorithm='brute')
+    model.fit(X_scaled)
+    return model, scaler, df, X_scaled
+
+
+def assemble(rankings_dir, spec):
+    """ City frame with name, countrycode, the score column and every feature. """
+    wanted = ['name', 'countrycode'] + list(dict.fromkeys(spec['features'] + [spec['score_column']]))
+    df = None
+    for ranking in spec['rankings']:
+        path = os.path.join(rankings_dir, ranking)
+        available = set(pq.read_schema(path).names)
+        missing = [c for c in wanted if df is None or c not in df.columns]
+        columns = [c for c in missing if c in available]
+        if df is None:
+            df = pq.read_table(path, columns=columns).to_pandas()
+        elif columns:
+            extra = pq.read_table(path, columns=['countrycode'] + columns)
+            extra = extra.to_pandas().drop_duplicates('countrycode')
+            df = df.merge(extra, on='countrycode', how='left')
+    absent = [c for c in wanted if c not in df.columns]
+    if absent:
+        raise ValueError(f"No ranking provides {', '.join(absent)}")
+    return df[wanted]
+
+
+def source_hash(df, spec):
+    """ Hash of the assembled frame and the training settings. """
+    digest = hashlib.sha1()
+    settings = {'features': spec['features'], 'weights': RANKING_WEIGHTS, 'model_file': spec['model_file']}
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(list(map(str, df.columns))).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def served_hash(model_path):
+    """ Source hash of the version CURRENT points at, or None. """
+    if read_pointer(model_path) is None:
+        return None
+    try:
+        with open(os.path.join(current_model_path(model_path), SOURCE_FILE), encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def prune(model_path, keep):
+    """ Delete all but the newest `keep` versions, never the current one. """
+    versions_dir = os.path.join(model_path, VERSIONS_DIR)
+    current = read_pointer(model_path)
+    versions = sorted(os.listdir(versions_dir), reverse=True)
+    for version in versions[keep:]:
+        if version != current:
+            shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+
+
+def publish(name, rankings_dir, version, keep):
+    spec = RECOMMENDERS[name]
+    model_path = os.path.join(HERE, spec['model_path'])
+    df = assemble(rankings_dir, spec)
+    source = source_hash(df, spec)
+    if source == served_hash(model_path):
+        print(f"{name}: unchanged, still serving {read_pointer(model_path)}")
+        return
+    model, scaler, df, _ = train(df, spec['features'])
+
+    version_dir = os.path.join(model_path, VERSIONS_DIR, version)
+    tmp_dir = version_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    save_artifacts(tmp_dir, spec['model_file'], model, scaler, df)
+    with open(os.path.join(tmp_dir, SOURCE_FILE), 'w', encoding='utf-8') as f:
+        f.write(source + '\n')
+    # The directory only appears under its final name once complete
+    os.replace(tmp_dir, version_dir)
+    publish_version(model_path, version)
+    prune(model_path, keep)
+    print(f"{name}: published {version} ({len(df)} cities)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('recommenders', nargs='*', help=f"any of {', '.join(RECOMMENDERS)} (default: all)")
+    parser.add_argument('--rankings-dir', default=SCORE_MODELS_DIR, help="where the score models write rankings")
+    parser.add_argument('--run-pipeline', action='store_true',
+                        help="bring the score models up to date first (pipeline.py in --rankings-dir)")
+    parser.add_argument('--keep', type=int, default=3, help="versions kept per recommender")
+    args = parser.parse_args()
+    unknown = set(args.recommenders) - set(RECOMMENDERS)
+    if unknown:
+        parser.error(f"unknown recommenders: {', '.join(sorted(unknown))}")
+
+    if args.run_pipeline:
+        subprocess.run([sys.executable, 'pipeline.py'], cwd=args.rankings_dir, check=True)
+
+    version = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    failed = []
+    for name in args.recommenders or list(RECOMMENDERS):
+        try:
+            publish(name, args.rankings_dir, version, args.keep)
+        except Exception as e:
+            failed.append(name)
+            print(f"{name}: not published, the backends keep their current version: {e}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# bench_ranking_load.py
+"""
+Benchmark of loading a score model ranking at backend startup: the full CSV
+(what wedding_backend used to parse), the CSV with only the used columns,
+and the projected Parquet file written by the score models.
+
+Without --parquet, the Parquet file is written from the CSV first, with the
+same columns and types the score models write.
+
+Usage:
+    python bench_ranking_load.py destination_wedding_ranking.csv
+    python bench_ranking_load.py ranking.csv --parquet ranking.parquet --repeat 10
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+import pandas as pd
+
+from artifacts import load_ranking
+
+# Columns wedding_backend reads
+COLUMNS = [
+    'name',
+    'countrycode',
+    'Ease of Business Score',
+    'GDP per Capita (USD)',
+    'International Air Passengers',
+    'Tourist Arrivals (millions)',
+    'Safety Index (Low Crime Rate)',
+    'Destination Wedding Score'
+]
+
+
+def write_parquet(csv_path, parquet_path, columns):
+    df = pd.read_csv(csv_path, usecols=columns)[columns]
+    df = df.astype({column: 'float64' for column in columns[2:]})
+    df.to_parquet(parquet_path, index=False, compression='zstd')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('csv')
+    parser.add_argument('--parquet', help="projected ranking (default: written from the CSV)")
+    parser.add_argument('--columns', nargs='+', default=COLUMNS)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    parquet_path = args.parquet
+    if parquet_path is None:
+        parquet_path = os.path.join(tempfile.mkdtemp(), 'ranking.parquet')
+        write_parquet(args.csv, parquet_path, args.columns)
+
+    paths = {
+        'full CSV': lambda: pd.read_csv(args.csv),
+        'projected CSV': lambda: load_ranking(args.csv, args.columns),
+        'Parquet': lambda: load_ranking(parquet_path, args.columns),
+    }
+    timings = {
+        label: timeit.timeit(load, number=args.repeat) / args.repeat
+        for label, load in paths.items()
+    }
+
+    rows = len(load_ranking(parquet_path, args.columns)[0])
+    print(f"rows: {rows}, columns: {len(args.columns)}")
+    print(f"file size   : CSV {os.path.getsize(args.csv) / 1e6:.1f} MB, "
+          f"Parquet {os.path.getsize(parquet_path) / 1e6:.1f} MB")
+    for label, seconds in timings.items():
+        print(f"{label:14}: {seconds * 1e3:9.1f} ms "
+              f"({timings['full CSV'] / seconds:5.1f}x vs full CSV)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# bench_recommend.py
+"""
+Microbenchmark of the /recommend hot path: the old pandas lookup
+(boolean masks + scaler.transform on a one-row DataFrame + sort_values)
+against the precomputed CityIndex.
+
+Usage:
+    python bench_recommend.py models medical_tourism_model.pkl "Medical Tourism Score"
+"""
+import argparse
+import random
+import timeit
+
+from artifacts import load_artifacts
+from city_index import CityIndex
+
+FEATURES = {
+    'Medical Tourism Score': [
+        'Hospital Beds per 1,000',
+        'Health Spending per Capita (USD)',
+        'GDP per Capita (USD)',
+        'Tourist Arrivals per Year',
+        'Ease of Doing Business Score',
+        'Safety Index (Homicide Rate)'
+    ],
+    'MICE Score': [
+        'Ease of Doing Business Score',
+        'GDP per Capita (USD)',
+        'International Air Passengers',
+        'Tourist Arrivals',
+        'Safety Index (Homicide Rate)',
+        'MICE Score'
+    ],
+}
+
+
+def pandas_recommend(artifacts, features, score_column, city, country):
+    df = artifacts.df
+    city_data = df[(df['name'] == city) & (df['countrycode'] == country)]
+    X_scaled = artifacts.scaler.transform(city_data[features])
+    _, indices = artifacts.model.kneighbors(X_scaled)
+    recommendations = df.iloc[indices[0][1:]].sort_values(score_column, ascending=False)
+    return (city_data.iloc[0][['name', 'countrycode'] + features].to_dict(),
+            recommendations.head(20).to_dict('records'))
+
+
+def index_recommend(index, city, country):
+    row = index.find(city, country)
+    rows = index.ranked_neighbors(row)
+    return (index.record(row, ['name', 'countrycode'] + index.features),
+            index.records_for(rows[:20]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('model_path')
+    parser.add_argument('model_file')
+    parser.add_argument('score_column', choices=sorted(FEATURES))
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    features = FEATURES[args.score_column]
+    artifacts = load_artifacts(args.model_path, args.model_file)
+    index = CityIndex(artifacts, features, args.score_column)
+
+    random.seed(0)
+    keys = random.sample(list(index.rows), min(args.queries, len(index.rows)))
+
+    old = timeit.timeit(
+        lambda: [pandas_recommend(artifacts, features, args.score_column, *k) for k in keys],
+        number=3
+    ) / (3 * len(keys))
+    new = timeit.timeit(
+        lambda: [index_recommend(index, *k) for k in keys],
+        number=3
+    ) / (3 * len(keys))
+
+    print(f"rows: {len(artifacts.df)}, queries: {len(keys)}")
+    print(f"pandas path : {old * 1e6:9.1f} us/request")
+    print(f"index path  : {new * 1e6:9.1f} us/request")
+    print(f"speedup     : {old / new:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
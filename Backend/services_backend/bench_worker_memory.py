@@ -0,0 +1,97 @@
+# bench_worker_memory.py
+"""
+Per-worker memory benchmark for the recommender artifacts.
+
+Starts N fresh worker processes (like Gunicorn workers without --preload),
+has each one load a model directory either from the legacy pickles or from
+the memory-mapped layout written by artifacts.py, touches every array, and
+reports RSS and PSS while all workers are alive. PSS divides shared pages
+between the processes mapping them, so it shows how much memory each worker
+really costs.
+
+The directory must hold both layouts: keep the legacy pickles and run
+`python artifacts.py <model_path> <model_file>` once to add the new files.
+Linux only (reads /proc/self/smaps_rollup).
+
+Usage:
+    python bench_worker_memory.py models medical_tourism_model.pkl --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+
+
+def read_memory_kb():
+    """ Return (rss, pss, shared) for the current process in kB. """
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    shared = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+    return values.get('Rss', 0), values.get('Pss', 0), shared
+
+
+def worker(mode, model_path, model_file, barrier, results):
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from artifacts import load_artifacts, SCALER_FILE, LEGACY_FRAME_FILE
+
+    baseline = read_memory_kb()
+    if mode == 'pickle':
+        model = joblib.load(os.path.join(model_path, model_file))
+        joblib.load(os.path.join(model_path, SCALER_FILE))
+        df = pd.read_pickle(os.path.join(model_path, LEGACY_FRAME_FILE))
+        fit_X = model._fit_X
+    else:
+        model, _, df, fit_X = load_artifacts(model_path, model_file)
+
+    # Touch every page so lazily mapped data is counted
+    float(np.asarray(fit_X).sum())
+    df.select_dtypes('number').sum()
+    model.kneighbors(np.asarray(fit_X[:1]))
+
+    barrier.wait()
+    rss, pss, shared = read_memory_kb()
+    results.put((os.getpid(), rss - baseline[0], pss - baseline[1], shared))
+    barrier.wait()
+
+
+def run(mode, model_path, model_file, workers):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(mode, model_path, model_file, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('model_path')
+    parser.add_argument('model_file')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', choices=['pickle', 'mmap', 'both'], default='both')
+    args = parser.parse_args()
+
+    modes = ['pickle', 'mmap'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        rows = run(mode, args.model_path, args.model_file, args.workers)
+        print(f"\n== {mode}: {args.workers} workers ==")
+        print(f"{'pid':>8} {'RSS kB':>10} {'PSS kB':>10} {'shared kB':>10}")
+        for pid, rss, pss, shared in rows:
+            print(f"{pid:>8} {rss:>10} {pss:>10} {shared:>10}")
+        print(f"{'total':>8} {sum(r[1] for r in rows):>10} {sum(r[2] for r in rows):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# city_index.py
+"""
+Precomputed lookup structures for the KNN recommenders.
+
+Built once per process from the loaded artifacts so that /recommend,
+/cities and the dashboard callbacks never scan the DataFrame:
+  X           : scaled feature matrix (C-contiguous float32), one row per city
+  normalized  : min-max normalised features in [0, 1], for weighted re-ranking
+  rows        : (name, countrycode) -> row number
+  records     : row number -> plain dict of that row, ready for jsonify
+  cities      : countrycode -> sorted list of city names
+"""
+import numpy as np
+
+
+class CityIndex:
+    def __init__(self, artifacts, features, score_column):
+        self.model = artifacts.model
+        self.df = artifacts.df
+        self.features = features
+        self.score_column = score_column
+        self.version = artifacts.version
+
+        df = self.df
+        fit_X = artifacts.fit_X
+        if fit_X is not None and fit_X.shape == (len(df), len(features)):
+            X = fit_X
+        else:
+            X = artifacts.scaler.transform(df[features])
+        self.X = np.ascontiguousarray(X, dtype=np.float32)
+        self.scores = df[score_column].to_numpy(dtype=np.float64)
+
+        raw = df[features].to_numpy(dtype=np.float64)
+        low = np.nanmin(raw, axis=0)
+        span = np.nanmax(raw, axis=0) - low
+        span[span == 0] = 1
+        self.normalized = np.ascontiguousarray(np.nan_to_num((raw - low) / span), dtype=np.float32)
+
+        # First match wins, like df[...].iloc[0] did
+        self.rows = {}
+        for row, key in enumerate(zip(df['name'], df['countrycode'])):
+            self.rows.setdefault(key, row)
+
+        self.records = df.to_dict('records')
+        self._columns = {}
+
+        self.cities = {}
+        for name, country in self.rows:
+            if isinstance(name, str) and isinstance(country, str):
+                self.cities.setdefault(country, set()).add(name)
+        self.cities = {country: sorted(names) for country, names in self.cities.items()}
+        self.countries = sorted(self.cities)
+
+    def find(self, city, country):
+        """ Return the row number of a city, or None. """
+        return self.rows.get((city, country))
+
+    def neighbors(self, row):
+        """ Row numbers of the KNN neighbours of `row`, excluding the city itself. """
+        _, indices = self.model.kneighbors(self.X[row:row + 1])
+        return indices[0][1:]
+
+    def ranked_neighbors(self, row):
+        """ Neighbours of `row` ordered by descending score. """
+        rows = self.neighbors(row)
+        return rows[np.argsort(-self.scores[rows], kind='stable')]
+
+    def parse_weights(self, weights):
+        """
+        Turn a client weight spec into a vector aligned with `features`.
+
+        Accepts {feature: weight} (features left out weigh 0) or a list in
+        feature order. Negative weights penalise a feature, e.g. a high
+        homicide rate. Raises ValueError for anything else.
+        """
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(self.features)
+            if unknown:
+                raise ValueError(f"Unknown features in weights: {sorted(unknown)}")
+            vector = [weights.get(feature, 0) for feature in self.features]
+        elif isinstance(weights, list):
+            if len(weights) != len(self.features):
+                raise ValueError(f"Expected {len(self.features)} weights, got {len(weights)}")
+            vector = weights
+        else:
+            raise ValueError("weights must be an object or a list")
+
+        try:
+            vector = np.asarray(vector, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("weights must be numbers")
+        total = np.abs(vector).sum()
+        if not np.isfinite(total) or total == 0:
+            raise ValueError("weights must be finite and not all zero")
+        return vector / total
+
+    def top_k(self, weights, k, exclude=None):
+        """
+        Re-score every city with `weights` (one matrix-vector product) and
+        return the k best rows with their scores, best first.
+        """
+        scores = self.normalized @ weights
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, len(scores) - (exclude is not None))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
+
+    def scored_records(self, rows, scores):
+        """ Records for `rows` with their personalised score attached. """
+        return [
+            {**self.records[row], 'Personalized Score': float(score)}
+            for row, score in zip(rows, scores)
+        ]
+
+    def column(self, name, rows):
+        """ Values of one column for `rows` as a JSON-ready list (NaN -> None). """
+        values = self._columns.get(name)
+        if values is None:
+            values = self.df[name].to_numpy()
+            if values.dtype.kind == 'f':
+                values = np.where(np.isnan(values), None, values)
+            self._columns[name] = values
+        return values[rows].tolist()
+
+    def record(self, row, columns=None):
+        record = self.records[row]
+        if columns is None:
+            return record
+        return {column: record[column] for column in columns}
+
+    def records_for(self, rows):
+        return [self.records[row] for row in rows]
@@ -0,0 +1,40 @@
+# dash_cache.py
+"""
+Server-side cache for the Dash dashboard callbacks (flask-caching).
+
+The cache lives outside the worker processes so every Gunicorn worker
+shares it:
+  - CACHE_REDIS_URL set : RedisCache. Run the Redis instance with
+                          `maxmemory <size>` and `maxmemory-policy allkeys-lru`
+                          to get LRU eviction.
+  - otherwise           : FileSystemCache in DASH_CACHE_DIR, bounded to
+                          DASH_CACHE_SIZE entries; past that the entries
+                          closest to expiry (the oldest written) are pruned.
+
+Callers put the model version in the memoized arguments, so a new model
+simply stops hitting old entries; DASH_CACHE_TIMEOUT (default one week)
+only bounds how long unused entries linger.
+"""
+import os
+import tempfile
+
+from flask_caching import Cache
+
+
+def init_cache(server, name):
+    """ Attach a callback cache named `name` to the Flask server. """
+    config = {
+        'CACHE_DEFAULT_TIMEOUT': int(os.environ.get('DASH_CACHE_TIMEOUT', 7 * 24 * 3600)),
+        'CACHE_KEY_PREFIX': f'{name}:',
+    }
+    redis_url = os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        config.update({'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': redis_url})
+    else:
+        cache_dir = os.environ.get('DASH_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'yatra_dash_cache'))
+        config.update({
+            'CACHE_TYPE': 'FileSystemCache',
+            'CACHE_DIR': os.path.join(cache_dir, name),
+            'CACHE_THRESHOLD': int(os.environ.get('DASH_CACHE_SIZE', 2048)),
+        })
+    return Cache(server, config=config)
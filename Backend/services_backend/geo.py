@@ -0,0 +1,20 @@
+# geo.py
+"""
+Vectorized great-circle helpers.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat, lon, lats, lons):
+    """
+    Distance in metres from (lat, lon) to every point of the `lats`/`lons`
+    arrays. NaN coordinates give NaN distances.
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64)) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
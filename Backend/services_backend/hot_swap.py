@@ -0,0 +1,173 @@
+# hot_swap.py
+"""
+Zero-downtime model swaps for the KNN recommender backends.
+
+batch_score.py writes each new model as versions/<version>/ and then
+repoints the model directory's CURRENT file at it. A LiveIndex watches that
+pointer (polling, and at once on SIGHUP). When the pointer changes, a
+background thread:
+  1. loads the new artifacts and builds their CityIndex
+  2. warms them up: touches the memory-mapped arrays, runs a KNN query,
+     then runs the backend's warm-up (typically replaying the most recent
+     requests, so the response cache already holds the new version's
+     answers)
+  3. swaps them in with a single reference assignment
+
+Handlers read `live.index` once and use that snapshot, so no request mixes
+two versions. If the new version fails to load or to warm up (a replayed
+request that the old version answered now fails), the old one keeps serving
+and the load is retried at the next check.
+
+Settings (environment):
+  MODEL_POLL_INTERVAL : seconds between CURRENT checks (default 30; 0 checks
+                        on SIGHUP only)
+  MODEL_WARM_REQUESTS : recent requests replayed before a swap (default 64)
+"""
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from artifacts import current_model_path, load_artifacts, read_pointer
+
+
+class LiveIndex:
+    def __init__(self, model_path, model_file, build, warm=None, initial=None):
+        """
+        `build(artifacts)` makes the CityIndex; `warm(index)` runs with
+        `index` staged as this thread's live.index. `initial` serves until
+        a first version is published (default: load from model_path).
+        """
+        self.model_path = model_path
+        self.model_file = model_file
+        self.build = build
+        self.warm = warm
+        self.pointer = read_pointer(model_path)
+        if initial is None:
+            initial = build(load_artifacts(current_model_path(model_path), model_file))
+        self._index = initial
+        self._staged = threading.local()
+        self._reload_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def index(self):
+        """ The CityIndex serving requests (the staged one inside a warm-up). """
+        staged = getattr(self._staged, 'index', None)
+        return staged if staged is not None else self._index
+
+    @contextmanager
+    def staged(self, index):
+        """ Make `index` this thread's live.index for the duration. """
+        self._staged.index = index
+        try:
+            yield index
+        finally:
+            self._staged.index = None
+
+    def check(self):
+        """ Load, warm and swap in the version CURRENT points at, if it changed. Returns True on a swap. """
+        with self._reload_lock:
+            pointer = read_pointer(self.model_path)
+            if pointer is None or pointer == self.pointer:
+                return False
+            started = time.monotonic()
+            try:
+                index = self.build(load_artifacts(current_model_path(self.model_path), self.model_file))
+                self.prewarm(index)
+            except Exception as e:
+                print(f"Loading model version {pointer} failed, still serving {self.pointer}: {e}")
+                return False
+            self._index = index
+            self.pointer = pointer
+            print(f"Serving model version {pointer} (loaded in {time.monotonic() - started:.1f}s)")
+            return True
+
+    def prewarm(self, index):
+        # Page the memory-mapped matrix in and run the KNN path once
+        float(np.asarray(index.X).sum())
+        if len(index.X):
+            index.model.kneighbors(index.X[:1])
+        if self.warm is not None:
+            with self.staged(index):
+                self.warm(index)
+
+    def reload(self, *args):
+        """ Check CURRENT now (safe to call from a signal handler). """
+        self._wake.set()
+
+    def start(self, interval=None):
+        """ Watch CURRENT in a daemon thread; also reload on SIGHUP where possible. """
+        if interval is None:
+            interval = float(os.environ.get('MODEL_POLL_INTERVAL', 30))
+        if self._thread is not None:
+            return self
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            # Leave handlers installed by a process manager alone
+            if signal.getsignal(signal.SIGHUP) in (signal.SIG_DFL, None):
+                signal.signal(signal.SIGHUP, self.reload)
+
+        def watch():
+            while True:
+                self._wake.wait(interval if interval > 0 else None)
+                self._wake.clear()
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"Model watch error: {e}")
+
+        self._thread = threading.Thread(target=watch, name='model-watch', daemon=True)
+        self._thread.start()
+        return self
+
+
+def replay_recent(server, response_cache, limit=None):
+    """
+    Warm-up that replays the most recent cacheable requests through the app,
+    so their responses are cached for the new version before it goes live.
+    These requests were answered 200 by the serving version, so one that
+    raises or gets a 5xx from the new version fails the warm-up (and the
+    swap).
+    """
+    if limit is None:
+        limit = int(os.environ.get('MODEL_WARM_REQUESTS', 64))
+
+    def warm(index):
+        client = server.test_client()
+        requests = response_cache.recent_requests(limit)
+        failed = []
+        for method, path, query_string, body, content_type in requests:
+            try:
+                status = client.open(path, method=method, query_string=query_string, data=body,
+                                     content_type=content_type).status_code
+            except Exception as e:
+                status = e
+            if not isinstance(status, int) or status >= 500:
+                failed.append(f"{method} {path}?{query_string}: {status}")
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(requests)} warm-up requests failed, "
+                               f"e.g. {'; '.join(failed[:3])}")
+        return len(requests)
+    return warm
+
+
+def recent_cities(response_cache, limit=None):
+    """ (city, country) of the most recent /recommend-style requests, newest first. """
+    if limit is None:
+        limit = int(os.environ.get('MODEL_WARM_REQUESTS', 64))
+    cities = []
+    for _, _, _, body, _ in response_cache.recent_requests():
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            continue
+        if isinstance(data, dict) and 'city' in data and 'country' in data:
+            key = (data['city'], data['country'])
+            if key not in cities:
+                cities.append(key)
+    return cities[:limit]
@@ -1,24 +1,21 @@
 # backend.py
 from flask import Flask, jsonify, request
-import pandas as pd
-import joblib
-import plotly.graph_objs as go
-import plotly.express as px
-from dash import Dash, html, dcc, Input, Output
-import json
+from dash import Dash, html, dcc, Input, Output, State
 import os
+from functools import lru_cache
 from flask_cors import CORS
+from city_index import CityIndex
+from http_cache import ResponseCache
+from dash_cache import init_cache
+from hot_swap import LiveIndex, recent_cities, replay_recent
 
 # Initialize Flask and Dash
 server = Flask(__name__)
 CORS(server)
 app = Dash(__name__, server=server, url_base_pathname='/dashboard/')
 
-# Load artifacts
+# Artifacts directory (new versions are published here by batch_score.py)
 model_path = os.path.join(os.path.dirname(__file__), 'models')
-model = joblib.load(os.path.join(model_path, 'medical_tourism_model.pkl'))
-scaler = joblib.load(os.path.join(model_path, 'scaler.pkl'))
-df = pd.read_pickle(os.path.join(model_path, 'cities_df.pkl'))
 
 features = [
     'Hospital Beds per 1,000',
@@ -28,52 +25,73 @@ features = [
     'Ease of Doing Business Score',
     'Safety Index (Homicide Rate)'
 ]
+response_cache = ResponseCache()
+callback_cache = init_cache(server, 'medical')
+replay = replay_recent(server, response_cache)
+
+def warm(index):
+    """ Fill the response and dashboard caches for the recent cities before a swap. """
+    replay(index)
+    for city, country in recent_cities(response_cache):
+        dashboard_data(country, city, index.version)
+
+# Serves the current model version and swaps in new ones without a restart
+live = LiveIndex(model_path, 'medical_tourism_model.pkl',
+                 lambda artifacts: CityIndex(artifacts, features, 'Medical Tourism Score'),
+                 warm=warm)
 
 # Dashboard layout
-app.layout = html.Div([
-    html.H1('Medical Tourism Dashboard', className='title'),
+def serve_layout():
+    """ Built on every page load, so the dropdowns list the live model's cities. """
+    index = live.index
+    return html.Div([
+        html.H1('Medical Tourism Dashboard', className='title'),
     
-    html.Div([
         html.Div([
-            dcc.Dropdown(
-                id='country-dropdown',
-                options=[{'label': i, 'value': i} for i in sorted(df['countrycode'].unique())],
-                placeholder='Select a Country'
-            ),
-            dcc.Dropdown(
-                id='city-dropdown',
-                placeholder='Select a City'
-            ),
-        ], className='dropdown-container'),
+            html.Div([
+                dcc.Dropdown(
+                    id='country-dropdown',
+                    options=[{'label': i, 'value': i} for i in index.countries],
+                    placeholder='Select a Country'
+                ),
+                dcc.Dropdown(
+                    id='city-dropdown',
+                    placeholder='Select a City'
+                ),
+                # country -> cities, shipped once so the city dropdown fills client-side
+                dcc.Store(id='country-cities', data=index.cities),
+            ], className='dropdown-container'),
         
-        html.Div([
             html.Div([
-                html.H3('Key Metrics'),
-                html.Div(id='key-metrics', className='metrics-container')
-            ], className='metrics-section'),
+                html.Div([
+                    html.H3('Key Metrics'),
+                    html.Div(id='key-metrics', className='metrics-container')
+                ], className='metrics-section'),
             
-            html.Div([
-                html.H3('Healthcare Infrastructure'),
-                dcc.Graph(id='healthcare-chart')
-            ], className='chart-section'),
+                html.Div([
+                    html.H3('Healthcare Infrastructure'),
+                    dcc.Graph(id='healthcare-chart')
+                ], className='chart-section'),
             
-            html.Div([
-                html.H3('Cost Analysis'),
-                dcc.Graph(id='cost-analysis')
-            ], className='chart-section'),
+                html.Div([
+                    html.H3('Cost Analysis'),
+                    dcc.Graph(id='cost-analysis')
+                ], className='chart-section'),
             
-            html.Div([
-                html.H3('Safety Comparison'),
-                dcc.Graph(id='safety-comparison')
-            ], className='chart-section'),
+                html.Div([
+                    html.H3('Safety Comparison'),
+                    dcc.Graph(id='safety-comparison')
+                ], className='chart-section'),
             
-            html.Div([
-                html.H3('Top Recommendations'),
-                html.Div(id='recommendations-table')
-            ], className='recommendations-section')
-        ], className='dashboard-content')
-    ], className='main-container')
-], className='dashboard')
+                html.Div([
+                    html.H3('Top Recommendations'),
+                    html.Div(id='recommendations-table')
+                ], className='recommendations-section')
+            ], className='dashboard-content')
+        ], className='main-container')
+    ], className='dashboard')
+
+app.layout = serve_layout
 
 # Add custom CSS
 app.index_string = '''
@@ -138,15 +156,17 @@ app.index_string = '''
 '''
 
 @server.route('/countries', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_countries():
-    countries = df['countrycode'].dropna().unique().tolist()
-    return jsonify({'countries': sorted(countries)})
+    index = live.index
+    return jsonify({'countries': index.countries})
 
 @server.route('/cities', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_cities():
+    index = live.index
     country = request.args.get('country')
-    cities = df[df['countrycode'] == country]['name'].unique().tolist()
-    return jsonify({'cities': sorted(cities)})
+    return jsonify({'cities': index.cities.get(country, [])})
 
 def create_metric_card(title, value, trend=None):
     trend_element = html.Div([
@@ -162,15 +182,21 @@ def create_metric_card(title, value, trend=None):
         ])
     ], className='metric-card')
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(country, cities) {
+        if (!country || !cities || !cities[country]) {
+            return [];
+        }
+        return cities[country].map(function(name) {
+            return {label: name, value: name};
+        });
+    }
+    """,
     Output('city-dropdown', 'options'),
-    Input('country-dropdown', 'value')
+    Input('country-dropdown', 'value'),
+    State('country-cities', 'data')
 )
-def update_cities(country):
-    if not country:
-        return []
-    cities = df[df['countrycode'] == country]['name'].unique()
-    return [{'label': i, 'value': i} for i in sorted(cities)]
 
 @app.callback(
     [Output('key-metrics', 'children'),
@@ -185,67 +211,10 @@ def update_dashboard(country, city):
     if not country or not city:
         return [], {}, {}, {}, []
     
-    # Get city data and recommendations
-    city_data = df[(df['name'] == city) & (df['countrycode'] == country)]
-    X_city = city_data[features]
-    X_scaled = scaler.transform(X_city)
-    distances, indices = model.kneighbors(X_scaled)
-    recommendations = df.iloc[indices[0][1:]]
-    
-    # Create metrics cards
-    metrics = [
-        create_metric_card(
-            'Tourism Score',
-            f"{city_data['Medical Tourism Score'].iloc[0]:.1f}",
-            5.2
-        ),
-        create_metric_card(
-            'Healthcare Index',
-            f"{city_data['Hospital Beds per 1,000'].iloc[0]:.1f}",
-            3.1
-        ),
-        create_metric_card(
-            'Safety Score',
-            f"{city_data['Safety Index (Homicide Rate)'].iloc[0]:.1f}",
-            1.8
-        )
-    ]
-    
-    # Create healthcare infrastructure chart
-    healthcare_fig = go.Figure()
-    healthcare_fig.add_trace(go.Bar(
-        x=recommendations['name'],
-        y=recommendations['Hospital Beds per 1,000'],
-        name='Hospital Beds'
-    ))
-    healthcare_fig.update_layout(
-        title='Healthcare Infrastructure Comparison',
-        height=400
-    )
-    
-    # Create cost analysis chart
-    cost_fig = px.scatter(
-        recommendations,
-        x='Health Spending per Capita (USD)',
-        y='Medical Tourism Score',
-        size='GDP per Capita (USD)',
-        hover_data=['name'],
-        title='Cost vs Quality Analysis'
-    )
-    cost_fig.update_layout(height=400)
-    
-    # Create safety comparison chart
-    safety_fig = go.Figure()
-    safety_fig.add_trace(go.Scatter(
-        x=recommendations['name'],
-        y=recommendations['Safety Index (Homicide Rate)'],
-        mode='lines+markers',
-        name='Safety Index'
-    ))
-    safety_fig.update_layout(
-        title='Safety Index Comparison',
-        height=400
-    )
+    data = dashboard_data(country, city, live.index.version)
+    if data is None:
+        return [], {}, {}, {}, []
+    metrics, healthcare_fig, cost_fig, safety_fig, table_rows = data
     
     # Create recommendations table
     recommendations_table = html.Table([
@@ -258,82 +227,161 @@ def update_dashboard(country, city):
                 html.Th('Safety Score')
             ])
         ),
-        html.Tbody([
-            html.Tr([
-                html.Td(row['name']),
-                html.Td(row['countrycode']),
-                html.Td(f"{row['Medical Tourism Score']:.1f}"),
-                html.Td(f"{row['Hospital Beds per 1,000']:.1f}"),
-                html.Td(f"{row['Safety Index (Homicide Rate)']:.1f}")
-            ]) for _, row in recommendations.head(5).iterrows()
-        ])
+        html.Tbody([html.Tr([html.Td(cell) for cell in cells]) for cells in table_rows])
     ], className='recommendations-table')
     
-    return metrics, healthcare_fig, cost_fig, safety_fig, recommendations_table
+    return ([create_metric_card(*metric) for metric in metrics],
+            healthcare_fig, cost_fig, safety_fig, recommendations_table)
+
+@callback_cache.memoize()
+def dashboard_data(country, city, version):
+    """
+    Plain (picklable) dashboard content for one city.
+
+    Memoized in the shared callback cache under (country, city, model version),
+    so switching back to a city any worker has already rendered skips the KNN
+    query and the figure building.
+    """
+    index = live.index
+    row = index.find(city, country)
+    if row is None:
+        return None
+    rows = index.neighbors(row).tolist()
+    selected = index.record(row)
+    
+    # Metric cards as (title, value, trend)
+    metrics = [
+        ('Tourism Score', f"{selected['Medical Tourism Score']:.1f}", 5.2),
+        ('Healthcare Index', f"{selected['Hospital Beds per 1,000']:.1f}", 3.1),
+        ('Safety Score', f"{selected['Safety Index (Homicide Rate)']:.1f}", 1.8)
+    ]
+    
+    # Charts, from the same dict builders as /recommend
+    healthcare_fig = create_healthcare_visualization(index, rows)
+    healthcare_fig['layout'] = {'title': {'text': 'Healthcare Infrastructure Comparison'}, 'height': 400}
+    
+    cost_fig = create_cost_visualization(index, rows)
+    cost_fig['layout'].update({'title': {'text': 'Cost vs Quality Analysis'}, 'height': 400})
+    
+    safety_fig = create_safety_visualization(index, rows)
+    safety_fig['data'][0]['name'] = 'Safety Index'
+    safety_fig['layout'] = {'title': {'text': 'Safety Index Comparison'}, 'height': 400}
+    
+    table_rows = [
+        [
+            record['name'],
+            record['countrycode'],
+            f"{record['Medical Tourism Score']:.1f}",
+            f"{record['Hospital Beds per 1,000']:.1f}",
+            f"{record['Safety Index (Homicide Rate)']:.1f}"
+        ] for record in index.records_for(rows[:5])
+    ]
+    
+    return metrics, healthcare_fig, cost_fig, safety_fig, table_rows
 
 @server.route('/recommend', methods=['POST'])
+@response_cache.cached(lambda: live.index.version)
 def recommend():
+    index = live.index
     data = request.json
     city_name = data['city']
     country_code = data['country']
     
     # Find city data
-    city_data = df[(df['name'] == city_name) & 
-                   (df['countrycode'] == country_code)]
+    row = index.find(city_name, country_code)
     
-    if city_data.empty:
+    if row is None:
         return jsonify({'error': 'City not found'}), 404
     
-    # Get recommendations and create visualizations
-    X_city = city_data[features]
-    X_scaled = scaler.transform(X_city)
-    distances, indices = model.kneighbors(X_scaled)
-    recommendations = df.iloc[indices[0][1:]]
-    recommendations = recommendations.sort_values('Medical Tourism Score', 
-                                               ascending=False)
+    weights = data.get('weights')
+    if weights is not None:
+        # Re-rank every city by the client's priorities (safety, cost, ...)
+        try:
+            rows, scores = index.top_k(index.parse_weights(weights), 20, exclude=row)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        top_records = index.scored_records(rows, scores)
+    else:
+        # Get recommendations (already sorted by score)
+        rows = index.ranked_neighbors(row)
+        top_records = index.records_for(rows[:20])
     
     # Prepare dashboard data
     dashboard_data = {
-        'selected': city_data.iloc[0][[
-            'name', 'countrycode', 'Medical Tourism Score'] + features
-        ].to_dict(),
-        'recommendations': recommendations.head(20).to_dict('records'),
-        'visualizations': {
-            'healthcare': create_healthcare_visualization(city_data, recommendations),
-            'cost': create_cost_visualization(city_data, recommendations),
-            'safety': create_safety_visualization(city_data, recommendations)
-        }
+        'selected': index.record(row, ['name', 'countrycode', 'Medical Tourism Score'] + features),
+        'recommendations': top_records
     }
     
+    # Figures are opt-in: /recommend?include=visualizations
+    include = request.args.get('include', '').split(',')
+    if 'visualizations' in include:
+        dashboard_data['visualizations'] = create_visualizations(tuple(rows.tolist()), index.version)
+    
     return jsonify(dashboard_data)
 
-def create_healthcare_visualization(city_data, recommendations):
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=recommendations['name'],
-        y=recommendations['Hospital Beds per 1,000'],
-        name='Hospital Beds'
-    ))
-    return json.loads(fig.to_json())
+# Figure specs are built directly as Plotly JSON dicts from the precomputed
+# columns; building go.Figure objects and round-tripping them through
+# fig.to_json() cost far more than the recommendation itself.
+@lru_cache(maxsize=512)
+def create_visualizations(rows, version):
+    """ All /recommend figures for the given recommendation rows (cached per model version). """
+    index = live.index
+    rows = list(rows)
+    return {
+        'healthcare': create_healthcare_visualization(index, rows),
+        'cost': create_cost_visualization(index, rows),
+        'safety': create_safety_visualization(index, rows)
+    }
 
-def create_cost_visualization(city_data, recommendations):
-    fig = px.scatter(
-        recommendations,
-        x='Health Spending per Capita (USD)',
-        y='Medical Tourism Score',
-        size='GDP per Capita (USD)',
-        hover_data=['name']
-    )
-    return json.loads(fig.to_json())
+def create_healthcare_visualization(index, rows):
+    return {
+        'data': [{
+            'type': 'bar',
+            'x': index.column('name', rows),
+            'y': index.column('Hospital Beds per 1,000', rows),
+            'name': 'Hospital Beds'
+        }],
+        'layout': {}
+    }
+
+def create_cost_visualization(index, rows):
+    x_label = 'Health Spending per Capita (USD)'
+    y_label = 'Medical Tourism Score'
+    size_label = 'GDP per Capita (USD)'
+    sizes = index.column(size_label, rows)
+    max_size = max((v for v in sizes if v is not None), default=0) or 1
+    return {
+        'data': [{
+            'type': 'scatter',
+            'mode': 'markers',
+            'x': index.column(x_label, rows),
+            'y': index.column(y_label, rows),
+            'customdata': [[name] for name in index.column('name', rows)],
+            # Same bubble scaling as px.scatter(size=...) with size_max=20
+            'marker': {'size': sizes, 'sizemode': 'area', 'sizeref': 2.0 * max_size / 20 ** 2},
+            'hovertemplate': (f'{x_label}=%{{x}}<br>{y_label}=%{{y}}<br>'
+                              f'{size_label}=%{{marker.size}}<br>name=%{{customdata[0]}}<extra></extra>'),
+            'showlegend': False
+        }],
+        'layout': {
+            'xaxis': {'title': {'text': x_label}},
+            'yaxis': {'title': {'text': y_label}},
+            'legend': {'itemsizing': 'constant'}
+        }
+    }
+
+def create_safety_visualization(index, rows):
+    return {
+        'data': [{
+            'type': 'scatter',
+            'mode': 'lines+markers',
+            'x': index.column('name', rows),
+            'y': index.column('Safety Index (Homicide Rate)', rows)
+        }],
+        'layout': {}
+    }
 
-def create_safety_visualization(city_data, recommendations):
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=recommendations['name'],
-        y=recommendations['Safety Index (Homicide Rate)'],
-        mode='lines+markers'
-    ))
-    return json.loads(fig.to_json())
+live.start()
 
 if __name__ == '__main__':
     app.run_server(debug=True, port=5000)
\ No newline at end of file
@@ -1,19 +1,17 @@
 # backend.py
 from flask import Flask, jsonify, request
-import pandas as pd
-import joblib
 import os
 from flask_cors import CORS
+from city_index import CityIndex
+from http_cache import ResponseCache
+from hot_swap import LiveIndex, replay_recent
 
 # Initialize Flask
 server = Flask(__name__)
 CORS(server)
 
-# Load artifacts
+# Artifacts directory (new versions are published here by batch_score.py)
 model_path = os.path.join(os.path.dirname(__file__), 'models_mice')
-model = joblib.load(os.path.join(model_path, 'city_ranking_model.pkl'))
-scaler = joblib.load(os.path.join(model_path, 'scaler.pkl'))
-df = pd.read_pickle(os.path.join(model_path, 'cities_df.pkl'))
 
 # Updated features list
 features = [
@@ -24,48 +22,70 @@ features = [
     'Safety Index (Homicide Rate)',
     'MICE Score'
 ]
+response_cache = ResponseCache()
+# Serves the current model version and swaps in new ones without a restart
+live = LiveIndex(model_path, 'city_ranking_model.pkl',
+                 lambda artifacts: CityIndex(artifacts, features, 'MICE Score'),
+                 warm=replay_recent(server, response_cache))
 
 @server.route('/countries', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_countries():
     """ Return a list of available countries. """
-    countries = df['countrycode'].dropna().unique().tolist()
-    return jsonify({'countries': sorted(countries)})
+    index = live.index
+    return jsonify({'countries': index.countries})
 
 @server.route('/cities', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_cities():
     """ Return a list of cities for a given country. """
+    index = live.index
     country = request.args.get('country')
-    cities = df[df['countrycode'] == country]['name'].unique().tolist()
-    return jsonify({'cities': sorted(cities)})
+    return jsonify({'cities': index.cities.get(country, [])})
 
 @server.route('/recommend', methods=['POST'])
+@response_cache.cached(lambda: live.index.version)
 def recommend():
-    """ Return recommendations for a selected city. """
+    """
+    Return recommendations for a selected city.
+
+    An optional 'weights' field ({feature: weight} or a list in `features`
+    order) re-ranks all cities by the client's own priorities instead of
+    returning the KNN neighbours.
+    """
+    index = live.index
     data = request.json
     city_name = data['city']
     country_code = data['country']
 
     # Find city data
-    city_data = df[(df['name'] == city_name) & (df['countrycode'] == country_code)]
+    row = index.find(city_name, country_code)
 
-    if city_data.empty:
+    if row is None:
         return jsonify({'error': 'City not found'}), 404
 
-    # Get recommendations based on KNN
-    X_city = city_data[features]
-    X_scaled = scaler.transform(X_city)
-    distances, indices = model.kneighbors(X_scaled)
-    recommendations = df.iloc[indices[0][1:]]
-    
-    recommendations = recommendations.sort_values('MICE Score', ascending=False)
+    weights = data.get('weights')
+    if weights is not None:
+        # Re-rank every city by the client's weights
+        try:
+            rows, scores = index.top_k(index.parse_weights(weights), 20, exclude=row)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        recommendations = index.scored_records(rows, scores)
+    else:
+        # Get recommendations based on KNN, sorted by MICE Score
+        rows = index.ranked_neighbors(row)
+        recommendations = index.records_for(rows[:20])
 
     # Prepare response data
     dashboard_data = {
-        'selected': city_data.iloc[0][['name', 'countrycode', 'MICE Score'] + features].to_dict(),
-        'recommendations': recommendations.head(20).to_dict('records')
+        'selected': index.record(row, ['name', 'countrycode'] + features),
+        'recommendations': recommendations
     }
 
     return jsonify(dashboard_data)
 
+live.start()
+
 if __name__ == '__main__':
     server.run(debug=True, port=5000)
@@ -0,0 +1,39 @@
+# osm_categories.py
+"""
+Overpass tag filters of the /process categories, kept apart from backend.py
+so tools such as prewarm.py can list the categories without loading the app.
+"""
+
+categories = {
+    "medical_tourism": [
+        '["amenity"="hospital"]',
+        '["amenity"="clinic"]',
+        '["amenity"="pharmacy"]',
+        '["amenity"="doctors"]',
+        '["leisure"="spa"]',
+        '["leisure"="fitness_centre"]',
+        '["emergency"="ambulance_station"]',
+        '["emergency"="fire_station"]',
+    ],
+    "mice": [
+        '["amenity"="conference_centre"]',
+        '["amenity"="exhibition_centre"]',
+        '["amenity"="events_venue"]',
+        '["amenity"="theatre"]',
+        '["amenity"="parking"]',
+        '["amenity"="wifi"]',
+        '["amenity"="charging_station"]',
+        '["amenity"="atm"]',
+        '["amenity"="bank"]',
+    ],
+    "destination_weddings": [
+        '["amenity"="place_of_worship"]',
+        '["amenity"="events_venue"]',
+        '["amenity"="toilets"]',
+        '["amenity"="parking"]',
+        '["leisure"="garden"]',
+        '["shop"="bridal"]',
+        '["shop"="gift"]',
+        '["shop"="florist"]',
+    ],
+}
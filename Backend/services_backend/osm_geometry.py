@@ -0,0 +1,121 @@
+# osm_geometry.py
+"""
+Batched geometry builder for Overpass results (Shapely 2).
+
+Ways and multipolygon relations are assembled from their node refs in one
+pass per result instead of one Shapely call per element:
+  - node refs are resolved to coordinates with a sorted id table and
+    np.searchsorted; elements with unresolved refs get no geometry
+  - closed ways become polygons, open ways linestrings
+  - multipolygon / boundary relations become the area built from their
+    member ways (shapely.build_area, even-odd, so roles need not be trusted
+    and outer rings split over several ways are joined)
+  - polygons are repaired with shapely.make_valid and centroided in bulk
+
+The result must carry the geometry of its ways and relations, i.e. the query
+recurses down (the "geometry" output profile).
+"""
+from collections import namedtuple
+
+import numpy as np
+import shapely
+
+AREA_RELATION_TYPES = ("multipolygon", "boundary")
+
+# Geometries of one element kind, aligned with the result's element list.
+# Elements without a geometry have None and NaN coordinates.
+ElementGeometries = namedtuple('ElementGeometries', ['ids', 'geometries', 'lats', 'lons'])
+
+
+def _flatten(ref_lists):
+    """ (flat refs, owner index of each ref, length of each list) """
+    lengths = np.fromiter((len(refs) for refs in ref_lists), dtype=np.int64, count=len(ref_lists))
+    flat = np.fromiter((ref for refs in ref_lists for ref in refs), dtype=np.int64, count=int(lengths.sum()))
+    owner = np.repeat(np.arange(len(ref_lists)), lengths)
+    return flat, owner, lengths
+
+
+def _lookup(sorted_ids, refs):
+    """ Positions of `refs` in `sorted_ids`, and which of them were found. """
+    if len(sorted_ids) == 0:
+        return np.zeros(len(refs), dtype=np.int64), np.zeros(len(refs), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_ids, refs), len(sorted_ids) - 1)
+    return pos, sorted_ids[pos] == refs
+
+
+def _assemble(build, coords, owner, selected, out):
+    """
+    Build one geometry per selected owner from `coords` (grouped by the
+    sorted `owner` array) and store it in `out`.
+    """
+    mask = selected[owner]
+    if not mask.any():
+        return
+    targets, indices = np.unique(owner[mask], return_inverse=True)
+    out[targets] = build(coords[mask], indices=indices)
+
+
+def _finish(ids, geometries):
+    centroids = shapely.centroid(geometries)
+    return ElementGeometries(ids, geometries, shapely.get_y(centroids), shapely.get_x(centroids))
+
+
+def build_geometries(result):
+    """
+    Geometries of the ways and relations of an overpass_client Result, as
+    {"way": ElementGeometries, "relation": ElementGeometries}.
+    """
+    nodes = result.nodes
+    node_ids = np.fromiter((node.id for node in nodes), dtype=np.int64, count=len(nodes))
+    node_coords = np.array([(float(node.lon), float(node.lat)) for node in nodes],
+                           dtype=np.float64).reshape(-1, 2)
+    order = np.argsort(node_ids, kind='stable')
+    node_ids, node_coords = node_ids[order], node_coords[order]
+
+    # Ways
+    ways = result.ways
+    way_ids = np.fromiter((way.id for way in ways), dtype=np.int64, count=len(ways))
+    refs, owner, lengths = _flatten([way.node_ids for way in ways])
+    pos, found = _lookup(node_ids, refs)
+    complete = (lengths >= 2) & (np.bincount(owner[~found], minlength=len(ways)) == 0)
+    coords = node_coords[pos] if len(nodes) else np.zeros((len(refs), 2))
+    starts = np.cumsum(lengths) - lengths
+    closed = np.zeros(len(ways), dtype=bool)
+    nonempty = lengths > 0
+    closed[nonempty] = refs[starts[nonempty]] == refs[starts[nonempty] + lengths[nonempty] - 1]
+    closed &= lengths >= 4
+
+    # Every complete way as a line, for relation assembly; closed ones as areas
+    lines = np.full(len(ways), None, dtype=object)
+    _assemble(shapely.linestrings, coords, owner, complete, lines)
+    way_geoms = lines.copy()
+    rings = np.full(len(ways), None, dtype=object)
+    _assemble(shapely.linearrings, coords, owner, complete & closed, rings)
+    areas = complete & closed
+    way_geoms[areas] = shapely.make_valid(shapely.polygons(rings[areas]))
+
+    # Multipolygon relations, from the lines of their member ways
+    relations = result.relations
+    relation_ids = np.fromiter((rel.id for rel in relations), dtype=np.int64, count=len(relations))
+    is_area = np.array([rel.tags.get("type") in AREA_RELATION_TYPES for rel in relations], dtype=bool)
+    member_refs = [
+        [m.ref for m in rel.members if m.type == "way"] if area else []
+        for rel, area in zip(relations, is_area)
+    ]
+    refs, owner, _ = _flatten(member_refs)
+    relation_geoms = np.full(len(relations), None, dtype=object)
+    way_order = np.argsort(way_ids, kind='stable')
+    pos, found = _lookup(way_ids[way_order], refs)
+    member_lines = lines[way_order[pos]] if len(ways) else np.full(len(refs), None, dtype=object)
+    usable = found & ~shapely.is_missing(member_lines)
+    if usable.any():
+        targets, indices = np.unique(owner[usable], return_inverse=True)
+        built = shapely.build_area(shapely.multilinestrings(member_lines[usable], indices=indices))
+        built = shapely.make_valid(built)
+        built[shapely.is_empty(built)] = None
+        relation_geoms[targets] = built
+
+    return {
+        "way": _finish(way_ids, way_geoms),
+        "relation": _finish(relation_ids, relation_geoms),
+    }
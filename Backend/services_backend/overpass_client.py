@@ -0,0 +1,535 @@
+# overpass_client.py
+"""
+Minimal Overpass API client with compact output profiles.
+
+Instead of overpy's full object model, the `[out:json]` response is parsed
+element by element as it is read off the socket (json.JSONDecoder.raw_decode
+over a sliding buffer), into small namedtuples with only the fields the
+backend uses. Tags are cut down to the profile's whitelist while parsing,
+so large results never hold every tag of every element in memory.
+
+Output profiles pick the `out` statement per use:
+  - geometry : `out body; >; out skel qt;` - full tags and node refs plus the
+               recursed skeleton, for building ways/relations (/process)
+  - center   : `out tags center qt;` - tags and a center per element, no node
+               lists and no recursion (*/search and */details)
+  - ids      : `out ids center qt;` - ids and centers only
+Overpass cannot filter tags server-side, so the whitelist is applied by the
+parser. A whitelist entry ending in ':' keeps every key with that prefix.
+
+Queries go through an OverpassClient over a list of mirrors:
+  - routing   : mirrors are tried by fewest consecutive failures, then lowest
+                latency (EWMA); untried mirrors go first, in configured
+                order - list a local instance first to prefer it
+  - retries   : failed queries are retried on the next best mirror; 429, 503
+                and 504 back off exponentially (with jitter, or Retry-After)
+  - breaker   : a mirror failing OVERPASS_BREAKER_FAILURES times in a row is
+                skipped for OVERPASS_BREAKER_COOLDOWN seconds, then gets a
+                single trial query; with every mirror open, queries fail fast
+                with OverpassUnavailable instead of hanging
+  - hedging   : a query still running after OVERPASS_HEDGE_AFTER seconds is
+                also sent to the second best mirror; the first answer wins
+  - store     : raw responses are written to disk as they stream in and
+                served from there for OVERPASS_CACHE_TTL seconds, so every
+                worker process (and the prewarm job) shares them
+  - streaming : OverpassClient.stream yields the parsed elements as they
+                arrive instead of returning the whole Result
+
+Settings (environment):
+  OVERPASS_MIRRORS            : comma-separated interpreter URLs (default
+                                OVERPASS_URL, else the public mirrors)
+  OVERPASS_URL                : single interpreter endpoint
+  OVERPASS_TIMEOUT            : server-side query timeout in seconds (default 60)
+  OVERPASS_RETRIES            : retries after the first attempt (default 2)
+  OVERPASS_BACKOFF            : base backoff in seconds (default 1)
+  OVERPASS_HEDGE_AFTER        : hedge delay in seconds, 0 disables (default 8)
+  OVERPASS_BREAKER_FAILURES   : consecutive failures opening a mirror (default 3)
+  OVERPASS_BREAKER_COOLDOWN   : seconds a mirror stays open (default 60)
+  OVERPASS_CACHE_DIR          : response store directory
+  OVERPASS_CACHE_TTL          : seconds a stored response is served, 0 disables
+                                the store (default 86400)
+  OVERPASS_CACHE_SIZE         : max stored responses (default 10000)
+"""
+import codecs
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MIRRORS = (
+    'https://overpass-api.de/api/interpreter',
+    'https://overpass.kumi.systems/api/interpreter',
+    'https://overpass.private.coffee/api/interpreter',
+)
+OVERPASS_TIMEOUT = int(os.environ.get('OVERPASS_TIMEOUT', 60))
+CHUNK_SIZE = 64 * 1024
+# HTTP statuses meaning "busy, come back later": back off before retrying
+BACKOFF_STATUSES = (429, 503, 504)
+MAX_BACKOFF = 30
+
+Node = namedtuple('Node', ['id', 'lat', 'lon', 'tags'])
+Way = namedtuple('Way', ['id', 'center_lat', 'center_lon', 'tags', 'node_ids'])
+Relation = namedtuple('Relation', ['id', 'center_lat', 'center_lon', 'tags', 'members'])
+Member = namedtuple('Member', ['type', 'ref', 'role'])
+Result = namedtuple('Result', ['nodes', 'ways', 'relations'])
+
+# `tags` is a whitelist of tag keys, or None for all tags
+OutputProfile = namedtuple('OutputProfile', ['out', 'tags'])
+
+OUTPUT_MODES = {
+    "geometry": "out body;\n>;\nout skel qt;",
+    "center": "out tags center qt;",
+    "ids": "out ids center qt;",
+}
+
+_REMARK = re.compile(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")')
+_WHITESPACE = re.compile(r'[\s,]*')
+
+
+class OverpassError(Exception):
+    pass
+
+
+class OverpassUnavailable(OverpassError):
+    """ Every mirror's circuit is open. """
+
+
+def profile(mode, tags=None):
+    return OutputProfile(OUTPUT_MODES[mode], tuple(tags) if tags is not None else None)
+
+
+def tag_filter(whitelist):
+    """ Function cutting a tag dict down to `whitelist` (None keeps all tags). """
+    if whitelist is None:
+        return dict
+    keys = frozenset(key for key in whitelist if not key.endswith(':'))
+    prefixes = tuple(key for key in whitelist if key.endswith(':'))
+
+    def keep(tags):
+        return {key: value for key, value in tags.items()
+                if key in keys or (prefixes and key.startswith(prefixes))}
+    return keep
+
+
+def iter_elements(stream):
+    """
+    Yield the element dicts of an Overpass JSON response read from the
+    binary file object `stream`, one at a time. Raises OverpassError when the
+    response carries a runtime error remark (timeouts, out of memory).
+    """
+    decoder = json.JSONDecoder()
+    read = getattr(stream, 'read1', stream.read)
+    text = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = None  # inside the elements array once set
+    eof = False
+    while True:
+        if pos is None:
+            start = buf.find('"elements"')
+            bracket = buf.find('[', start) if start >= 0 else -1
+            if bracket >= 0:
+                # Parse what is already buffered before reading more
+                buf, pos = buf[bracket + 1:], 0
+                continue
+        else:
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf) and buf[pos] == ']':
+                    tail = buf[pos + 1:] + text.decode(stream.read(), final=True)
+                    remark = _REMARK.search(tail)
+                    if remark and 'error' in json.loads(remark.group(1)):
+                        raise OverpassError(json.loads(remark.group(1)))
+                    return
+                try:
+                    element, pos = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise OverpassError("Truncated Overpass response")
+                    break
+                yield element
+            buf, pos = buf[pos:], 0
+        if eof:
+            raise OverpassError("Malformed Overpass response")
+        # read1 returns what has arrived instead of waiting for a full chunk
+        chunk = read(CHUNK_SIZE)
+        eof = not chunk
+        buf += text.decode(chunk, final=eof)
+
+
+def parse_element(element, keep):
+    """ Node, Way or Relation of an element dict, with tags cut by `keep` (None for other types). """
+    kind = element.get('type')
+    tags = keep(element.get('tags') or {})
+    center = element.get('center') or {}
+    if kind == 'node':
+        return Node(element['id'], element.get('lat'), element.get('lon'), tags)
+    if kind == 'way':
+        return Way(element['id'], center.get('lat'), center.get('lon'), tags, element.get('nodes') or [])
+    if kind == 'relation':
+        members = [Member(m.get('type'), m.get('ref'), m.get('role')) for m in element.get('members') or []]
+        return Relation(element['id'], center.get('lat'), center.get('lon'), tags, members)
+    return None
+
+
+def iter_parsed(stream, whitelist=None):
+    """ Yield the parsed elements of an Overpass JSON response as they are read. """
+    keep = tag_filter(whitelist)
+    for element in iter_elements(stream):
+        parsed = parse_element(element, keep)
+        if parsed is not None:
+            yield parsed
+
+
+def parse(stream, whitelist=None):
+    """ Parse an Overpass JSON response into a Result of namedtuples. """
+    nodes, ways, relations = [], [], []
+    for element in iter_parsed(stream, whitelist):
+        if isinstance(element, Node):
+            nodes.append(element)
+        elif isinstance(element, Way):
+            ways.append(element)
+        else:
+            relations.append(element)
+    return Result(nodes, ways, relations)
+
+
+def configured_mirrors():
+    mirrors = os.environ.get('OVERPASS_MIRRORS')
+    if mirrors:
+        return [url.strip() for url in mirrors.split(',') if url.strip()]
+    if os.environ.get('OVERPASS_URL'):
+        return [os.environ['OVERPASS_URL']]
+    return list(DEFAULT_MIRRORS)
+
+
+def is_client_error(error):
+    """ Errors caused by the query itself, which no mirror will answer. """
+    return (isinstance(error, urllib.error.HTTPError) and 400 <= error.code < 500
+            and error.code != 429)
+
+
+class _Tee:
+    """ Binary stream wrapper copying everything read into `sink`. """
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+    def read1(self, size=-1):
+        data = self.stream.read1(size)
+        self.sink.write(data)
+        return data
+
+
+class ResponseStore:
+    """ Raw Overpass responses on disk, keyed by the full query text. """
+    def __init__(self, directory, ttl, max_entries):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, ql):
+        return os.path.join(self.directory, hashlib.sha1(ql.encode('utf-8')).hexdigest() + '.json')
+
+    def open(self, ql):
+        """ Binary file of the stored response for `ql`, or None if missing or stale. """
+        path = self.path(ql)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+    def drop(self, ql, error):
+        path = self.path(ql)
+        print(f"Dropping unreadable Overpass response {path}: {error}")
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+    def load(self, ql, whitelist):
+        """ Parsed stored response for `ql`, or None if missing or stale. """
+        try:
+            f = self.open(ql)
+            if f is None:
+                return None
+            with f:
+                return parse(f, whitelist)
+        except (OverpassError, ValueError, OSError) as e:
+            self.drop(ql, e)
+            return None
+
+    def iter_stored(self, ql, whitelist):
+        """
+        Iterator over the parsed elements of the stored response for `ql`, or
+        None if missing or stale. A response found unreadable part way is
+        dropped and the error raised from the iterator.
+        """
+        try:
+            f = self.open(ql)
+        except OSError:
+            return None
+        if f is None:
+            return None
+
+        def elements():
+            with f:
+                try:
+                    yield from iter_parsed(f, whitelist)
+                except (OverpassError, ValueError, OSError) as e:
+                    self.drop(ql, e)
+                    raise
+        return elements()
+
+    @contextlib.contextmanager
+    def recording(self, ql):
+        """ File to copy a response into; kept only if the block succeeds. """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.replace(tmp, self.path(ql))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """ Drop the oldest responses beyond max_entries. """
+        with os.scandir(self.directory) as entries:
+            files = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.name.endswith('.json')]
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_entries)]:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+
+def default_store():
+    ttl = int(os.environ.get('OVERPASS_CACHE_TTL', 24 * 3600))
+    if ttl <= 0:
+        return None
+    directory = os.environ.get('OVERPASS_CACHE_DIR',
+                               os.path.join(tempfile.gettempdir(), 'yatra_overpass_cache'))
+    return ResponseStore(directory, ttl, int(os.environ.get('OVERPASS_CACHE_SIZE', 10000)))
+
+
+class Mirror:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None     # EWMA of successful query times, seconds
+        self.failures = 0       # consecutive failures
+        self.open_until = 0.0   # circuit open (mirror skipped) until then
+
+    def rank(self):
+        return (self.failures, self.latency or 0.0)
+
+
+class OverpassClient:
+    def __init__(self, mirrors=None, retries=None, backoff=None, hedge_after=None,
+                 breaker_failures=None, breaker_cooldown=None, store=False):
+        env = os.environ.get
+        # store=False: configure from the environment; None: no store
+        self.store = default_store() if store is False else store
+        self.mirrors = [Mirror(url) for url in (mirrors or configured_mirrors())]
+        self.retries = int(env('OVERPASS_RETRIES', 2)) if retries is None else retries
+        self.backoff = float(env('OVERPASS_BACKOFF', 1)) if backoff is None else backoff
+        self.hedge_after = float(env('OVERPASS_HEDGE_AFTER', 8)) if hedge_after is None else hedge_after
+        self.breaker_failures = (int(env('OVERPASS_BREAKER_FAILURES', 3))
+                                 if breaker_failures is None else breaker_failures)
+        self.breaker_cooldown = (float(env('OVERPASS_BREAKER_COOLDOWN', 60))
+                                 if breaker_cooldown is None else breaker_cooldown)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=int(env('OVERPASS_MAX_WORKERS', 16)),
+                                            thread_name_prefix='overpass')
+
+    def ranked(self):
+        """ Mirrors whose circuit is closed (or due a trial), best first. """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [m for m in self.mirrors if m.open_until <= now]
+        return sorted(candidates, key=Mirror.rank)
+
+    def _acquire(self, mirror):
+        # A mirror past its cooldown gets one trial query: keep it open for
+        # everyone else until that trial reports back
+        with self._lock:
+            if mirror.failures >= self.breaker_failures:
+                mirror.open_until = time.monotonic() + self.breaker_cooldown
+
+    def _record(self, mirror, elapsed=None, error=None):
+        with self._lock:
+            if error is None:
+                mirror.latency = elapsed if mirror.latency is None else 0.7 * mirror.latency + 0.3 * elapsed
+                mirror.failures = 0
+                mirror.open_until = 0.0
+                return
+            if is_client_error(error):
+                return
+            mirror.failures += 1
+            if mirror.failures >= self.breaker_failures:
+                mirror.open_until = time.monotonic() + self.breaker_cooldown
+
+    def _fetch(self, mirror, ql, whitelist, timeout):
+        started = time.monotonic()
+        data = urllib.parse.urlencode({'data': ql}).encode('utf-8')
+        try:
+            with urllib.request.urlopen(mirror.url, data=data, timeout=timeout) as response:
+                if self.store is None:
+                    result = parse(response, whitelist)
+                else:
+                    with self.store.recording(ql) as sink:
+                        result = parse(_Tee(response, sink), whitelist)
+        except Exception as e:
+            self._record(mirror, error=e)
+            raise
+        self._record(mirror, elapsed=time.monotonic() - started)
+        return result
+
+    def _hedged(self, mirrors, ql, whitelist, timeout):
+        """ Query the best mirror, hedging to the second after hedge_after. """
+        self._acquire(mirrors[0])
+        pending = {self._executor.submit(self._fetch, mirrors[0], ql, whitelist, timeout)}
+        hedged = len(mirrors) < 2 or not self.hedge_after
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=None if hedged else self.hedge_after,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+            if not hedged and not done:
+                hedged = True
+                self._acquire(mirrors[1])
+                pending.add(self._executor.submit(self._fetch, mirrors[1], ql, whitelist, timeout))
+        raise error
+
+    def _stream_response(self, mirror, response, ql, whitelist, started):
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(response)
+                source = response
+                if self.store is not None:
+                    source = _Tee(response, stack.enter_context(self.store.recording(ql)))
+                yield from iter_parsed(source, whitelist)
+        except Exception as e:
+            self._record(mirror, error=e)
+            raise
+        self._record(mirror, elapsed=time.monotonic() - started)
+
+    def _delay(self, error, attempt):
+        if not (isinstance(error, urllib.error.HTTPError) and error.code in BACKOFF_STATUSES):
+            return 0
+        retry_after = error.headers.get('Retry-After') if error.headers else None
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_BACKOFF)
+        return random.uniform(0, min(self.backoff * 2 ** attempt, MAX_BACKOFF))
+
+    def query(self, statements, output, timeout=None):
+        """
+        Run the Overpass QL `statements` (without settings or out statement)
+        with the OutputProfile `output` and return the parsed Result.
+        """
+        timeout = OVERPASS_TIMEOUT if timeout is None else timeout
+        ql = f"[out:json][timeout:{timeout}];\n{statements}\n{output.out}"
+        if self.store is not None:
+            result = self.store.load(ql, output.tags)
+            if result is not None:
+                return result
+        error = None
+        for attempt in range(self.retries + 1):
+            mirrors = self.ranked()
+            if not mirrors:
+                raise OverpassUnavailable("All Overpass mirrors are failing, try again later") from error
+            try:
+                return self._hedged(mirrors, ql, output.tags, timeout + 15)
+            except (OverpassError, urllib.error.URLError, socket.timeout, ConnectionError) as e:
+                if is_client_error(e):
+                    raise
+                error = e
+                print(f"Overpass query failed (attempt {attempt + 1}): {e}")
+                # No backoff after the last attempt: the caller gets the error at once
+                if attempt < self.retries:
+                    time.sleep(self._delay(e, attempt))
+        raise error
+
+    def stream(self, statements, output, timeout=None):
+        """
+        Like query(), but return an iterator over the parsed elements as
+        they are read off the socket, so the caller can pass each one on
+        before the response is complete. The connection is opened here, with
+        the same mirror routing and retries (but no hedging): failures before
+        the first byte raise from this call, later ones from the iterator.
+        """
+        timeout = OVERPASS_TIMEOUT if timeout is None else timeout
+        ql = f"[out:json][timeout:{timeout}];\n{statements}\n{output.out}"
+        if self.store is not None:
+            elements = self.store.iter_stored(ql, output.tags)
+            if elements is not None:
+                return elements
+        data = urllib.parse.urlencode({'data': ql}).encode('utf-8')
+        error = None
+        for attempt in range(self.retries + 1):
+            mirrors = self.ranked()
+            if not mirrors:
+                raise OverpassUnavailable("All Overpass mirrors are failing, try again later") from error
+            mirror = mirrors[0]
+            self._acquire(mirror)
+            started = time.monotonic()
+            try:
+                response = urllib.request.urlopen(mirror.url, data=data, timeout=timeout + 15)
+            except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+                self._record(mirror, error=e)
+                if is_client_error(e):
+                    raise
+                error = e
+                print(f"Overpass stream failed (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(self._delay(e, attempt))
+                continue
+            return self._stream_response(mirror, response, ql, output.tags, started)
+        raise error
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def default_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OverpassClient()
+        return _client
+
+
+def query(statements, output, timeout=None):
+    """ OverpassClient.query on the client configured from the environment. """
+    return default_client().query(statements, output, timeout)
+
+
+def stream(statements, output, timeout=None):
+    """ OverpassClient.stream on the client configured from the environment. """
+    return default_client().stream(statements, output, timeout)
@@ -0,0 +1,222 @@
+# prewarm.py
+"""
+Pre-warm the backend caches for the most visited cities, so the first user
+of a city does not pay the full Overpass + render cost.
+
+Runs every */search domain and every /process category for each city:
+  - the Overpass responses land in the shared response store
+    (see overpass_client), which also serves the */details lookups
+  - the maps, plots, CSV and GeoJSON files are rendered into ./output
+  - with --base-url the requests go to a running server instead, which
+    also fills that server's in-memory search caches
+
+Cities are the top N by population, or all cities above a population
+threshold, from the geonames data the cities CSV was built from (needs the
+`geonamescache` package), or an explicit CSV with City and Country columns.
+
+Requests run in parallel, throttled to --rate requests per second overall.
+Finished tasks are appended to the checkpoint file, and a re-run skips them.
+Searches are warmed at every --search-radius (default: the 20 km the search
+endpoints default to, and 50 km). The stored Overpass responses are keyed by
+the exact query, so a radius that was not warmed is fetched again; a warmed
+larger radius only answers smaller ones inside the in-memory search cache of
+a running server (--base-url).
+
+Usage (from this directory, next to the cities CSV):
+    python prewarm.py --top 100
+    python prewarm.py --min-population 1000000 --workers 4 --rate 2
+    python prewarm.py --cities top_cities.csv --base-url http://localhost:5000
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from osm_categories import categories
+
+CITIES_FILE = "cities_lat_long_geonamescache_with_countries.csv"
+SEARCH_DOMAINS = ("hotels", "sightseeing", "airports", "airlines", "medical", "mice")
+
+
+def ranked_cities(top=None, min_population=None):
+    """ (City, Country) pairs by descending geonames population. """
+    import geonamescache
+    gc = geonamescache.GeonamesCache()
+    countries = gc.get_countries()
+    cities = sorted(gc.get_cities().values(), key=lambda c: c['population'], reverse=True)
+    if min_population is not None:
+        cities = [c for c in cities if c['population'] >= min_population]
+    if top is not None:
+        cities = cities[:top]
+    return [(c['name'], countries[c['countrycode']]['name'] if c['countrycode'] in countries else 'Unknown')
+            for c in cities]
+
+
+def listed_cities(path):
+    df = pd.read_csv(path)
+    countries = df['Country'].fillna('') if 'Country' in df else [''] * len(df)
+    return list(zip(df['City'], countries))
+
+
+def build_tasks(cities, categories, search_radii, process_radius):
+    """ (task id, method, path, params) for every city, domain, search radius and category. """
+    tasks = []
+    for city, country in cities:
+        for domain in SEARCH_DOMAINS:
+            for radius in search_radii:
+                params = {"city": city, "country": country, "radius": radius}
+                tasks.append((f"search:{domain}:{radius}:{city}|{country}", "GET", f"/{domain}/search", params))
+        # /process looks cities up by name only
+        for category in categories:
+            params = {"city": city, "category": category, "radius": process_radius}
+            tasks.append((f"process:{category}:{city}", "POST", "/process", params))
+    # Cities sharing a name share their /process tasks
+    return list({task[0]: task for task in tasks}.values())
+
+
+class Throttle:
+    """ Spaces calls at least 1/rate seconds apart across all threads. """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """ Append-only file of finished task ids. """
+    def __init__(self, path, reset=False):
+        self.path = path
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def mark(self, task_id):
+        with self._lock:
+            self._file.write(task_id + '\n')
+            self._file.flush()
+            self.done.add(task_id)
+
+    def close(self):
+        self._file.close()
+
+
+def http_runner(base_url, timeout):
+    def run(method, path, params):
+        if method == "GET":
+            req = urllib.request.Request(f"{base_url}{path}?{urllib.parse.urlencode(params)}")
+        else:
+            req = urllib.request.Request(f"{base_url}{path}", data=json.dumps(params).encode('utf-8'),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return run
+
+
+def local_runner():
+    import backend
+    # pyplot keeps global state, so /process renders one at a time
+    render_lock = threading.Lock()
+    local = threading.local()
+
+    def run(method, path, params):
+        if not hasattr(local, 'client'):
+            local.client = backend.app.test_client()
+        if method == "GET":
+            return local.client.get(path, query_string=params).status_code
+        with render_lock:
+            return local.client.post(path, json=params).status_code
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--top', type=int, help="top N cities by population")
+    source.add_argument('--min-population', type=int, help="all cities with at least this population")
+    source.add_argument('--cities', help="CSV with City and Country columns")
+    parser.add_argument('--base-url', help="warm a running server instead of running the app in-process")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0, help="max requests per second, 0 for no limit")
+    parser.add_argument('--search-radius', type=int, nargs='+', default=[20000, 50000],
+                        help="search radii in meters, each warmed separately")
+    parser.add_argument('--process-radius', type=int, default=50000)
+    parser.add_argument('--timeout', type=int, default=300, help="per request, with --base-url")
+    parser.add_argument('--checkpoint', default='prewarm_checkpoint.txt')
+    parser.add_argument('--reset', action='store_true', help="ignore and clear the checkpoint")
+    args = parser.parse_args()
+
+    if args.cities:
+        cities = listed_cities(args.cities)
+    else:
+        cities = ranked_cities(args.top, args.min_population)
+    df = pd.read_csv(CITIES_FILE, usecols=['City', 'Country'])
+    known = set(zip(df['City'], df['Country']))
+    missing = [c for c in cities if c[1] and c not in known]
+    if missing:
+        print(f"Skipping {len(missing)} cities missing from {CITIES_FILE}")
+    cities = [c for c in cities if not c[1] or c in known]
+
+    run = http_runner(args.base_url.rstrip('/'), args.timeout) if args.base_url else local_runner()
+
+    checkpoint = Checkpoint(args.checkpoint, args.reset)
+    tasks = [t for t in build_tasks(cities, tuple(categories), args.search_radius, args.process_radius)
+             if t[0] not in checkpoint.done]
+    print(f"{len(cities)} cities, {len(tasks)} tasks to run ({len(checkpoint.done)} already done)")
+
+    throttle = Throttle(args.rate)
+
+    def warm(task):
+        task_id, method, path, params = task
+        throttle.wait()
+        started = time.monotonic()
+        status = run(method, path, params)
+        # 404 is a city or category with no data: nothing to retry
+        if status in (200, 404):
+            checkpoint.mark(task_id)
+        return task_id, status, time.monotonic() - started
+
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(warm, task) for task in tasks]
+            for i, future in enumerate(as_completed(futures), 1):
+                try:
+                    task_id, status, elapsed = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[{i}/{len(tasks)}] error: {e}")
+                    continue
+                if status not in (200, 404):
+                    failed += 1
+                print(f"[{i}/{len(tasks)}] {task_id}: {status} in {elapsed:.1f}s")
+    finally:
+        checkpoint.close()
+    print(f"Done, {failed} failed (re-run to retry them)")
+
+
+if __name__ == '__main__':
+    main()
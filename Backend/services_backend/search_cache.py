@@ -0,0 +1,106 @@
+# search_cache.py
+"""
+In-process cache of normalized */search result sets.
+
+A result set is everything a search produced for one (domain, center,
+radius): the normalized items, the rendered map and the recommendations.
+Pages and field projections are cut from the cached set, so paging through
+a large result never re-queries Overpass or re-renders the map.
+
+A search inside an area that is already cached (a smaller radius around the
+same city, or a sub-area of a larger search) is answered from the cached
+superset: its items are filtered with a vectorized haversine mask on their
+coordinates instead of querying Overpass again. Items are matched by their
+point / center coordinates, and items without coordinates are dropped.
+
+Settings (environment):
+  SEARCH_CACHE_SIZE : max cached result sets (default 256)
+  SEARCH_CACHE_TTL  : seconds a result set stays valid (default 3600)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from geo import haversine_m
+
+SearchResult = namedtuple('SearchResult', ['items', 'map_file', 'map_html', 'recommendations'])
+
+# Cache entry: the result plus its item coordinates as arrays for filtering
+_Entry = namedtuple('_Entry', ['stored_at', 'result', 'lats', 'lons'])
+
+
+class SearchCache:
+    def __init__(self, max_entries=None, ttl=None):
+        if max_entries is None:
+            max_entries = int(os.environ.get('SEARCH_CACHE_SIZE', 256))
+        if ttl is None:
+            ttl = int(os.environ.get('SEARCH_CACHE_TTL', 3600))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(domain, lat, lon, radius):
+        return (domain, round(float(lat), 6), round(float(lon), 6), int(radius))
+
+    def _fresh(self, key, entry):
+        if time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            return False
+        return True
+
+    def get(self, domain, lat, lon, radius):
+        key = self.key(domain, lat, lon, radius)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._fresh(key, entry):
+                return None
+            self._entries.move_to_end(key)
+            return entry.result
+
+    def get_within(self, domain, lat, lon, radius):
+        """
+        Items of the smallest cached result set of `domain` whose circle
+        contains the requested one, filtered to the requested circle.
+        Returns (items, stored_at), or None when no cached set covers it.
+        """
+        best = None
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                c_domain, c_lat, c_lon, c_radius = key
+                if c_domain != domain or c_radius < radius or not self._fresh(key, entry):
+                    continue
+                offset = haversine_m(c_lat, c_lon, [lat], [lon])[0]
+                if offset + radius <= c_radius and (best is None or c_radius < best[0][3]):
+                    best = (key, entry)
+            if best is None:
+                return None
+            key, entry = best
+            self._entries.move_to_end(key)
+        with np.errstate(invalid='ignore'):
+            mask = haversine_m(lat, lon, entry.lats, entry.lons) <= radius
+        items = entry.result.items
+        return [items[i] for i in np.flatnonzero(mask)], entry.stored_at
+
+    def put(self, domain, lat, lon, radius, result, stored_at=None):
+        """
+        Cache a result set. Pass `stored_at` for sets derived from a cached
+        superset, so they expire with it.
+        """
+        key = self.key(domain, lat, lon, radius)
+        lats = np.array([np.nan if item.get('lat') is None else item['lat'] for item in result.items],
+                        dtype=np.float64)
+        lons = np.array([np.nan if item.get('lon') is None else item['lon'] for item in result.items],
+                        dtype=np.float64)
+        if stored_at is None:
+            stored_at = time.monotonic()
+        with self._lock:
+            self._entries[key] = _Entry(stored_at, result, lats, lons)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
@@ -1,14 +1,14 @@
 # destination_wedding_backend.py
 from flask import Flask, jsonify, request
-import pandas as pd
-import joblib
 import os
-import plotly.graph_objs as go
-import plotly.express as px
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State
 from flask_cors import CORS
-from sklearn.preprocessing import StandardScaler
-from sklearn.neighbors import NearestNeighbors
+from artifacts import Artifacts, file_version, load_ranking, read_pointer, save_artifacts
+from batch_score import train
+from city_index import CityIndex
+from http_cache import ResponseCache
+from dash_cache import init_cache
+from hot_swap import LiveIndex, recent_cities, replay_recent
 
 # Initialize Flask & Dash
 server = Flask(__name__)
@@ -20,11 +20,6 @@ model_path = os.path.join(os.path.dirname(__file__), 'models_wedding')
 if not os.path.exists(model_path):
     os.makedirs(model_path)
 
-df = pd.read_csv('destination_wedding_ranking.csv')
-
-# Handle missing values
-df = df.dropna(subset=['countrycode'])
-
 # Define features for ranking
 features = [
     'Ease of Business Score',
@@ -35,112 +30,143 @@ features = [
     'Destination Wedding Score'
 ]
 
-# Normalize features
-scaler = StandardScaler()
-X = df[features]
-X_scaled = scaler.fit_transform(X)
+def train_index():
+    """ Train the model from the ranking, for a directory batch_score.py has not published to yet. """
+    # Only the columns used here are read from the ranking
+    df, data_file = load_ranking('destination_wedding_ranking.parquet', ['name', 'countrycode'] + features)
 
-# Compute weighted ranking score
-weights = [0.2, 0.2, 0.15, 0.15, 0.15, 0.15]
-df['City Ranking Score'] = (X_scaled * weights).sum(axis=1)
+    # Normalize features, compute the weighted ranking score and train KNN
+    model, scaler, df, X_scaled = train(df, features)
 
-# Train KNN model
-model = NearestNeighbors(n_neighbors=5, metric='cosine', algorithm='brute')
-model.fit(X_scaled)
+    # Save model, scaler & data in the shared (memory-mappable) layout
+    save_artifacts(model_path, 'wedding_ranking_model.pkl', model, scaler, df)
 
-# Save model & scaler
-joblib.dump(model, os.path.join(model_path, 'wedding_ranking_model.pkl'))
-joblib.dump(scaler, os.path.join(model_path, 'scaler.pkl'))
-df.to_pickle(os.path.join(model_path, 'wedding_cities_df.pkl'))
+    print("Destination Wedding Model training completed!")
+    return CityIndex(Artifacts(model, scaler, df, X_scaled, file_version(data_file)),
+                     features, 'Destination Wedding Score')
 
-print("Destination Wedding Model training completed!")
+response_cache = ResponseCache()
+callback_cache = init_cache(server, 'wedding')
+replay = replay_recent(server, response_cache)
 
-# Dashboard Layout
-app.layout = html.Div([
-    html.H1('Destination Wedding Planner', className='title'),
-
-    html.Div([
-        dcc.Dropdown(
-            id='country-dropdown',
-            options=[{'label': i, 'value': i} for i in sorted(df['countrycode'].unique())],
-            placeholder='Select a Country'
-        ),
-        dcc.Dropdown(
-            id='city-dropdown',
-            placeholder='Select a City'
-        ),
-    ], className='dropdown-container'),
-
-    html.Div([
-        html.Div([
-            html.H3('Key Metrics'),
-            html.Div(id='key-metrics', className='metrics-container')
-        ], className='metrics-section'),
+def warm(index):
+    """ Fill the response and dashboard caches for the recent cities before a swap. """
+    replay(index)
+    for city, country in recent_cities(response_cache):
+        dashboard_data(country, city, index.version)
 
-        html.Div([
-            html.H3('Destination Popularity'),
-            dcc.Graph(id='tourist-arrivals-chart')
-        ], className='chart-section'),
+# Serves the current model version and swaps in new ones without a restart
+live = LiveIndex(model_path, 'wedding_ranking_model.pkl',
+                 lambda artifacts: CityIndex(artifacts, features, 'Destination Wedding Score'),
+                 warm=warm, initial=None if read_pointer(model_path) else train_index())
+
+# Dashboard Layout
+def serve_layout():
+    """ Built on every page load, so the dropdowns list the live model's cities. """
+    index = live.index
+    return html.Div([
+        html.H1('Destination Wedding Planner', className='title'),
 
         html.Div([
-            html.H3('Safety Analysis'),
-            dcc.Graph(id='safety-comparison')
-        ], className='chart-section'),
+            dcc.Dropdown(
+                id='country-dropdown',
+                options=[{'label': i, 'value': i} for i in index.countries],
+                placeholder='Select a Country'
+            ),
+            dcc.Dropdown(
+                id='city-dropdown',
+                placeholder='Select a City'
+            ),
+            # country -> cities, shipped once so the city dropdown fills client-side
+            dcc.Store(id='country-cities', data=index.cities),
+        ], className='dropdown-container'),
 
         html.Div([
-            html.H3('Top Wedding Destination Recommendations'),
-            html.Div(id='recommendations-table')
-        ], className='recommendations-section')
-    ], className='dashboard-content')
-], className='dashboard')
+            html.Div([
+                html.H3('Key Metrics'),
+                html.Div(id='key-metrics', className='metrics-container')
+            ], className='metrics-section'),
+
+            html.Div([
+                html.H3('Destination Popularity'),
+                dcc.Graph(id='tourist-arrivals-chart')
+            ], className='chart-section'),
+
+            html.Div([
+                html.H3('Safety Analysis'),
+                dcc.Graph(id='safety-comparison')
+            ], className='chart-section'),
+
+            html.Div([
+                html.H3('Top Wedding Destination Recommendations'),
+                html.Div(id='recommendations-table')
+            ], className='recommendations-section')
+        ], className='dashboard-content')
+    ], className='dashboard')
+
+app.layout = serve_layout
 
 # Flask API Endpoints
 @server.route('/countries', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_countries():
-    countries = df['countrycode'].dropna().unique().tolist()
-    return jsonify({'countries': sorted(countries)})
+    index = live.index
+    return jsonify({'countries': index.countries})
 
 @server.route('/cities', methods=['GET'])
+@response_cache.cached(lambda: live.index.version)
 def get_cities():
+    index = live.index
     country = request.args.get('country')
-    cities = df[df['countrycode'] == country]['name'].unique().tolist()
-    return jsonify({'cities': sorted(cities)})
+    return jsonify({'cities': index.cities.get(country, [])})
 
 @server.route('/recommend', methods=['POST'])
+@response_cache.cached(lambda: live.index.version)
 def recommend():
+    index = live.index
     data = request.json
     city_name = data['city']
     country_code = data['country']
 
-    city_data = df[(df['name'] == city_name) & (df['countrycode'] == country_code)]
+    row = index.find(city_name, country_code)
 
-    if city_data.empty:
+    if row is None:
         return jsonify({'error': 'City not found'}), 404
 
-    # Get recommendations using KNN
-    X_city = city_data[features]
-    X_scaled = scaler.transform(X_city)
-    distances, indices = model.kneighbors(X_scaled)
-    recommendations = df.iloc[indices[0][1:]]
-
-    # Sort recommendations by wedding score
-    recommendations = recommendations.sort_values('Destination Wedding Score', ascending=False)
+    weights = data.get('weights')
+    if weights is not None:
+        # Re-rank every city by the client's weights instead of the fixed ones
+        try:
+            rows, scores = index.top_k(index.parse_weights(weights), 10, exclude=row)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        recommendations = index.scored_records(rows, scores)
+    else:
+        # Get recommendations using KNN, sorted by wedding score
+        rows = index.ranked_neighbors(row)
+        recommendations = index.records_for(rows[:10])
 
     return jsonify({
-        'selected': city_data.iloc[0][['name', 'countrycode', 'Destination Wedding Score'] + features].to_dict(),
-        'recommendations': recommendations.head(10).to_dict('records')
+        'selected': index.record(row, ['name', 'countrycode'] + features),
+        'recommendations': recommendations
     })
 
 # Dashboard Callbacks
-@app.callback(
+app.clientside_callback(
+    """
+    function(country, cities) {
+        if (!country || !cities || !cities[country]) {
+            return [];
+        }
+        return cities[country].map(function(name) {
+            return {label: name, value: name};
+        });
+    }
+    """,
     Output('city-dropdown', 'options'),
-    Input('country-dropdown', 'value')
+    Input('country-dropdown', 'value'),
+    State('country-cities', 'data')
 )
-def update_cities(country):
-    if not country:
-        return []
-    cities = df[df['countrycode'] == country]['name'].unique()
-    return [{'label': i, 'value': i} for i in sorted(cities)]
 
 @app.callback(
     [Output('key-metrics', 'children'),
@@ -154,41 +180,73 @@ def update_dashboard(country, city):
     if not country or not city:
         return [], {}, {}, []
 
-    city_data = df[(df['name'] == city) & (df['countrycode'] == country)]
-    X_city = city_data[features]
-    X_scaled = scaler.transform(X_city)
-    distances, indices = model.kneighbors(X_scaled)
-    recommendations = df.iloc[indices[0][1:]]
+    data = dashboard_data(country, city, live.index.version)
+    if data is None:
+        return [], {}, {}, []
+    metrics, tourist_fig, safety_fig, table_rows = data
+
+    # Recommendations Table
+    recommendations_table = html.Table([
+        html.Thead(html.Tr([html.Th('City'), html.Th('Country'), html.Th('Wedding Score')])),
+        html.Tbody([html.Tr([html.Td(cell) for cell in cells]) for cells in table_rows])
+    ])
+
+    return [html.Div(metric, className='metric-card') for metric in metrics], tourist_fig, safety_fig, recommendations_table
+
+@callback_cache.memoize()
+def dashboard_data(country, city, version):
+    """
+    Plain (picklable) dashboard content for one city, memoized in the shared
+    callback cache under (country, city, model version).
+    """
+    index = live.index
+    row = index.find(city, country)
+    if row is None:
+        return None
+    rows = index.neighbors(row).tolist()
+    selected = index.record(row)
+    names = index.column('name', rows)
 
     # Metrics
     metrics = [
-        html.Div(f"Wedding Score: {city_data['Destination Wedding Score'].iloc[0]:.2f}", className='metric-card'),
-        html.Div(f"Safety Index: {city_data['Safety Index (Low Crime Rate)'].iloc[0]:.2f}", className='metric-card')
+        f"Wedding Score: {selected['Destination Wedding Score']:.2f}",
+        f"Safety Index: {selected['Safety Index (Low Crime Rate)']:.2f}"
     ]
 
     # Tourist Arrivals Chart
-    tourist_fig = px.bar(
-        recommendations,
-        x='name',
-        y='Tourist Arrivals (millions)',
-        title='Tourist Arrivals per Destination'
-    )
+    tourist_fig = {
+        'data': [{'type': 'bar', 'x': names, 'y': index.column('Tourist Arrivals (millions)', rows)}],
+        'layout': {
+            'title': {'text': 'Tourist Arrivals per Destination'},
+            'xaxis': {'title': {'text': 'name'}},
+            'yaxis': {'title': {'text': 'Tourist Arrivals (millions)'}}
+        }
+    }
 
     # Safety Comparison Chart
-    safety_fig = px.scatter(
-        recommendations,
-        x='Safety Index (Low Crime Rate)',
-        y='Destination Wedding Score',
-        title='Safety vs Wedding Score'
-    )
+    safety_fig = {
+        'data': [{
+            'type': 'scatter',
+            'mode': 'markers',
+            'x': index.column('Safety Index (Low Crime Rate)', rows),
+            'y': index.column('Destination Wedding Score', rows),
+            'text': names
+        }],
+        'layout': {
+            'title': {'text': 'Safety vs Wedding Score'},
+            'xaxis': {'title': {'text': 'Safety Index (Low Crime Rate)'}},
+            'yaxis': {'title': {'text': 'Destination Wedding Score'}}
+        }
+    }
+
+    table_rows = [
+        [record['name'], record['countrycode'], f"{record['Destination Wedding Score']:.2f}"]
+        for record in index.records_for(rows)
+    ]
 
-    # Recommendations Table
-    recommendations_table = html.Table([
-        html.Thead(html.Tr([html.Th('City'), html.Th('Country'), html.Th('Wedding Score')])),
-        html.Tbody([html.Tr([html.Td(row['name']), html.Td(row['countrycode']), html.Td(f"{row['Destination Wedding Score']:.2f}")]) for _, row in recommendations.iterrows()])
-    ])
+    return metrics, tourist_fig, safety_fig, table_rows
 
-    return metrics, tourist_fig, safety_fig, recommendations_table
+live.start()
 
 if __name__ == '__main__':
     app.run_server(debug=True, port=5000)
@@ -0,0 +1,77 @@
+# imputation.py
+"""
+Regression imputation of the indicator matrix, shared by the score models.
+
+Works on a numeric (countries x indicators) matrix. Rows are grouped by
+their missingness pattern, and each pattern gets one least-squares fit of
+its missing columns on its observed ones (plus an intercept), trained only
+on the rows where all of those columns are observed. Patterns without
+enough training rows fall back to the column means, and columns with no
+values at all to 0.
+
+A fit depends only on the column names and the training values, so it is
+cached under a hash of both: models sharing indicators (GDP, tourist
+arrivals, ...) reuse each other's fits within a process. The output is
+deterministic for a given input.
+"""
+import hashlib
+
+import numpy as np
+
+# (observed columns, missing columns, training data hash) -> coefficients
+_fits = {}
+MAX_FITS = 1024
+
+
+def _fit(X, observed, missing, names):
+    """ Coefficients of X[:, missing] ~ [1, X[:, observed]], or None if not enough rows. """
+    train = ~np.isnan(X[:, observed]).any(axis=1) & ~np.isnan(X[:, missing]).any(axis=1)
+    if train.sum() <= len(observed) + 1:
+        return None
+    A = X[np.ix_(train, observed)]
+    B = X[np.ix_(train, missing)]
+    key = (tuple(names[i] for i in observed), tuple(names[i] for i in missing),
+           hashlib.sha1(np.ascontiguousarray(A).tobytes() + np.ascontiguousarray(B).tobytes()).hexdigest())
+    coef = _fits.get(key)
+    if coef is None:
+        design = np.hstack([np.ones((len(A), 1)), A])
+        coef = np.linalg.lstsq(design, B, rcond=None)[0]
+        if len(_fits) >= MAX_FITS:
+            _fits.clear()
+        _fits[key] = coef
+    return coef
+
+
+def impute(X, names=None):
+    """
+    Copy of X (float, NaN for missing) with every missing value filled.
+    `names` identifies the columns for the fit cache (default: positions).
+    """
+    X = np.array(X, dtype=np.float64)
+    names = list(names) if names is not None else list(range(X.shape[1]))
+    missing_mask = np.isnan(X)
+    if not missing_mask.any():
+        return X
+
+    counts = (~missing_mask).sum(axis=0)
+    means = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+    out = X.copy()
+    # Columns without any value are not predicted, only filled
+    empty = counts == 0
+    out[:, empty] = 0.0
+    missing_mask[:, empty] = False
+    patterns, inverse = np.unique(missing_mask, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for p, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue
+        rows = np.flatnonzero(inverse == p)
+        missing = np.flatnonzero(pattern)
+        observed = np.flatnonzero(~pattern & ~empty)
+        coef = _fit(X, observed, missing, names) if len(observed) else None
+        if coef is None:
+            out[np.ix_(rows, missing)] = means[missing]
+        else:
+            design = np.hstack([np.ones((len(rows), 1)), X[np.ix_(rows, observed)]])
+            out[np.ix_(rows, missing)] = design @ coef
+    return out
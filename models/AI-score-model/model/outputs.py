@@ -0,0 +1,26 @@
+# outputs.py
+"""
+Ranking files written by the score models.
+
+The backends only read the city, its country, the indicators and the score,
+so the ranking is written as Parquet with just those columns: strings for
+the city and country, float64 for the rest, zstd-compressed. Optionally the
+full ranking (every city column) is written as CSV too, for the notebooks.
+"""
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+KEY_COLUMNS = ["name", "countrycode"]
+
+
+def write_ranking(df, path, columns, csv_path=None):
+    """ Write the projected, typed ranking to `path` (Parquet), atomically. """
+    projected = df[columns].reset_index(drop=True)
+    projected = projected.astype({column: "float64" for column in columns if column not in KEY_COLUMNS})
+    tmp = path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(projected, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, path)
+    if csv_path:
+        df.to_csv(csv_path, index=False)
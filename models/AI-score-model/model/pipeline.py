@@ -0,0 +1,249 @@
+# pipeline.py
+"""
+Incremental rebuild of the score models.
+
+Each model is a small chain of stages:
+
+  indicators -> countries -> cities -> neighbors
+  (store)       (impute,     (broadcast,  (k nearest cities,
+                 score)       rank,        cosine)
+                              Parquet)
+
+Every stage output is saved under <build dir>/<model>/ and identified by a
+content hash (SHA-1 of the data). manifest.json records, for each stage, the
+hashes of the inputs it was built from, and a stage re-runs only when one of
+them changed. The indicators stage always reads the store (which refreshes
+only stale indicators), so a refresh that leaves the values as they were
+stops there, and one that changes a few countries re-runs only the stages
+downstream of it.
+
+The neighbor table (the k nearest cities of every city, on the normalized
+indicators and the score) is updated in place: only the cities whose feature
+row changed, or whose current neighbors changed, are queried again, and the
+other cities just compare their k-th neighbor with the changed ones. It is
+keyed on the hash of the cities stage, so it only runs when the scored
+output changed.
+
+The backends' KNN recommenders are retrained from the rankings by
+Backend/services_backend/batch_score.py.
+
+Usage:
+    python pipeline.py                   # all models
+    python pipeline.py mice wedding --neighbors 10
+    python pipeline.py --force           # rebuild every stage
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_distances
+from sklearn.neighbors import NearestNeighbors
+
+import imputation
+import medicaltourism
+import mice
+import wedding
+from outputs import write_ranking
+from worldbank import default_city_file, fetch_world_bank_data, load_cities
+
+MODELS = {"medical": medicaltourism, "mice": mice, "wedding": wedding}
+MANIFEST = "manifest.json"
+# Rows of the kept cities compared with the changed ones at a time
+CHUNK_ROWS = 4096
+
+
+def digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def frame_hash(df):
+    return digest(list(map(str, df.columns)), pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return digest(f.read())
+
+
+def config_hash(model):
+    """ Settings and code of a model: editing its script or the imputation rebuilds it. """
+    return digest(model.indicators, model.trends, model.weights, model.score_column,
+                  file_hash(model.__file__), file_hash(imputation.__file__))
+
+
+def row_hashes(X):
+    return pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy()
+
+
+def _kneighbors(X, rows, k):
+    """ The k nearest rows of X (cosine) for each of `rows`, the row itself excluded. """
+    model = NearestNeighbors(n_neighbors=k + 1, metric="cosine", algorithm="brute").fit(X)
+    distances, indices = model.kneighbors(X[rows])
+    is_self = indices == rows[:, None]
+    # Ties can push the row itself out of its k + 1 nearest: drop the farthest instead
+    is_self[~is_self.any(axis=1), -1] = True
+    keep = ~is_self
+    return indices[keep].reshape(len(rows), k), distances[keep].reshape(len(rows), k)
+
+
+def neighbor_table(keys, X, k, previous=None):
+    """
+    {"keys", "row_hash", "indices", "distances"} for the rows of X, reusing
+    the `previous` table for the rows it still holds. Returns (table, number
+    of rows queried).
+    """
+    k = min(k, len(X) - 1)
+    hashes = row_hashes(X)
+    if (previous is not None and np.array_equal(previous["keys"], keys)
+            and previous["indices"].shape == (len(X), k)):
+        indices, distances = previous["indices"].copy(), previous["distances"].copy()
+        changed = hashes != previous["row_hash"]
+        changed_rows = np.flatnonzero(changed)
+        # Changed rows, and rows with a changed row among their neighbors, are queried again
+        stale = changed | changed[indices].any(axis=1)
+        kept = np.flatnonzero(~stale)
+        # The others keep their neighbors, unless a changed row has moved closer
+        for start in range(0, len(kept) if len(changed_rows) else 0, CHUNK_ROWS):
+            rows = kept[start:start + CHUNK_ROWS]
+            cand_i = np.hstack([indices[rows], np.broadcast_to(changed_rows, (len(rows), len(changed_rows)))])
+            cand_d = np.hstack([distances[rows], cosine_distances(X[rows], X[changed_rows])])
+            order = np.argsort(cand_d, axis=1, kind="stable")[:, :k]
+            indices[rows] = np.take_along_axis(cand_i, order, axis=1)
+            distances[rows] = np.take_along_axis(cand_d, order, axis=1)
+        query = np.flatnonzero(stale)
+    else:
+        indices, distances = np.zeros((len(X), k), dtype=np.int64), np.zeros((len(X), k))
+        query = np.arange(len(X))
+    if len(query) and k > 0:
+        indices[query], distances[query] = _kneighbors(X, query, k)
+    return {"keys": keys, "row_hash": hashes, "indices": indices, "distances": distances}, len(query)
+
+
+class Build:
+    """ Stage outputs and manifest of one model under `directory`. """
+    def __init__(self, directory, force=False):
+        self.directory = directory
+        self.force = force
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def path(self, stage, ext="pkl"):
+        return os.path.join(self.directory, f"{stage}.{ext}")
+
+    def fresh(self, stage, inputs, ext="pkl"):
+        entry = self.manifest.get(stage)
+        return (not self.force and entry is not None and entry["inputs"] == inputs
+                and os.path.exists(self.path(stage, ext)))
+
+    def output(self, stage):
+        return self.manifest[stage]["output"]
+
+    def record(self, stage, inputs, output):
+        self.manifest[stage] = {"inputs": inputs, "output": output}
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def save_frame(self, stage, df):
+        tmp = self.path(stage) + ".tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, self.path(stage))
+
+    def load_frame(self, stage):
+        return pd.read_pickle(self.path(stage))
+
+
+def build_model(name, cities_df, cities_hash, store=None, build_dir="build", k=5, force=False):
+    """ Bring every stage of one model up to date. Returns the names of the stages that ran. """
+    model = MODELS[name]
+    build = Build(os.path.join(build_dir, name), force)
+    ran = []
+
+    # indicators: read every time, the store only downloads what is stale
+    wb_df = fetch_world_bank_data(cities_df["countrycode"].unique(), model.indicators, store, model.trends)
+    inputs = {"config": config_hash(model)}
+    output = frame_hash(wb_df)
+    if not build.fresh("indicators", inputs) or build.output("indicators") != output:
+        build.save_frame("indicators", wb_df)
+        build.record("indicators", inputs, output)
+        ran.append("indicators")
+
+    # countries: impute, normalize and score
+    inputs = {"indicators": build.output("indicators"), "config": config_hash(model)}
+    if build.fresh("countries", inputs):
+        country_df = None
+    else:
+        country_df = model.score_countries(wb_df)
+        build.save_frame("countries", country_df)
+        build.record("countries", inputs, frame_hash(country_df))
+        ran.append("countries")
+
+    # cities: broadcast to the cities and rank, exported as the model's ranking file
+    inputs = {"countries": build.output("countries"), "cities": cities_hash}
+    if build.fresh("cities", inputs) and os.path.exists(model.output_file):
+        merged_df = None
+    else:
+        if country_df is None:
+            country_df = build.load_frame("countries")
+        merged_df = model.rank_cities(cities_df, country_df)
+        build.save_frame("cities", merged_df)
+        write_ranking(merged_df, model.output_file, model.output_columns)
+        build.record("cities", inputs, frame_hash(merged_df))
+        ran.append("cities")
+
+    # neighbors: k nearest cities, updated for the changed rows only
+    inputs = {"cities": build.output("cities"), "k": k}
+    if not build.fresh("neighbors", inputs, "npz"):
+        if merged_df is None:
+            merged_df = build.load_frame("cities")
+        ordered = merged_df.sort_index()
+        features = list(model.weights) + [model.score_column]
+        X = ordered[features].to_numpy(dtype=np.float64)
+        X[np.isnan(X)] = 0.0
+        previous = None
+        if not force and os.path.exists(build.path("neighbors", "npz")):
+            with np.load(build.path("neighbors", "npz")) as f:
+                previous = dict(f)
+        table, queried = neighbor_table(ordered.index.to_numpy(), X, k, previous)
+        tmp = build.path("neighbors", "tmp.npz")
+        np.savez(tmp, **table)
+        os.replace(tmp, build.path("neighbors", "npz"))
+        build.record("neighbors", inputs, digest(table["indices"].tobytes(), table["distances"].tobytes()))
+        print(f"{name}: neighbors updated for {queried} of {len(X)} cities")
+        ran.append("neighbors")
+    return ran
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("models", nargs="*", help=f"any of {', '.join(MODELS)} (default: all)")
+    parser.add_argument("--cities", default=default_city_file(), help="city dataset with countrycode and name columns")
+    parser.add_argument("--store", default=None, help="World Bank indicator store (SQLite)")
+    parser.add_argument("--build-dir", default="build")
+    parser.add_argument("--neighbors", type=int, default=5, help="neighbors per city in the neighbor table")
+    parser.add_argument("--force", action="store_true", help="rebuild every stage")
+    args = parser.parse_args()
+    unknown = set(args.models) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    cities_df = load_cities(args.cities)
+    cities_hash = file_hash(args.cities)
+    for name in args.models or list(MODELS):
+        ran = build_model(name, cities_df, cities_hash, args.store, args.build_dir, args.neighbors, args.force)
+        print(f"{name}: {', '.join(ran) if ran else 'up to date'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# trends.py
+"""
+Trend features of indicator series, vectorized over every series at once.
+
+`values` is an array whose last axis is the year (e.g. the indicator x
+country x year cube of worldbank.IndicatorStore.cube), with NaN for missing
+years. Gaps inside a series are skipped rather than interpolated.
+"""
+import numpy as np
+
+# Fewest years (span) / year-on-year changes a feature is computed from
+MIN_SPAN = 3
+MIN_CHANGES = 3
+
+
+def cagr(values, years, min_span=MIN_SPAN):
+    """
+    Compound annual growth rate between the first and the last year with a
+    figure: (last / first) ** (1 / years between) - 1. NaN where the span is
+    shorter than `min_span` years or either end is not positive.
+    """
+    years = np.asarray(years, dtype=np.float64)
+    observed = ~np.isnan(values)
+    first = np.argmax(observed, axis=-1)
+    last = values.shape[-1] - 1 - np.argmax(observed[..., ::-1], axis=-1)
+    start = np.take_along_axis(values, first[..., None], axis=-1)[..., 0]
+    end = np.take_along_axis(values, last[..., None], axis=-1)[..., 0]
+    span = years[last] - years[first]
+    valid = observed.any(axis=-1) & (span >= min_span) & (start > 0) & (end > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(end / start, 1.0 / np.where(valid, span, 1.0)) - 1.0
+    return np.where(valid, growth, np.nan)
+
+
+def volatility(values, min_changes=MIN_CHANGES):
+    """
+    Standard deviation of the year-on-year log growth, over the consecutive
+    years that both have a positive figure. NaN with fewer than
+    `min_changes` such pairs.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(np.where(values > 0, values, np.nan))
+    changes = np.diff(logs, axis=-1)
+    counted = ~np.isnan(changes)
+    n = counted.sum(axis=-1)
+    filled = np.where(counted, changes, 0.0)
+    mean = filled.sum(axis=-1) / np.maximum(n, 1)
+    variance = (np.where(counted, changes - mean[..., None], 0.0) ** 2).sum(axis=-1) / np.maximum(n, 1)
+    return np.where(n >= min_changes, np.sqrt(variance), np.nan)
@@ -1,20 +1,12 @@
+import argparse
+
 import pandas as pd
-import requests
-import time
-from sklearn.impute import KNNImputer
 from sklearn.preprocessing import MinMaxScaler
-
-# Load country dataset
-file_path = r"C:\Algo_Master\project\complete_city_details_geonamescache.csv"  # Ensure correct path
-df = pd.read_csv(file_path)
-
-# Extract unique country codes
-unique_countries = df["countrycode"].unique()
-print(f"Total Unique Countries Found: {len(unique_countries)}\n")
+from imputation import impute
+from outputs import write_ranking
+from worldbank import default_city_file, fetch_world_bank_data, load_cities, trend_columns
 
 # === FETCHING DESTINATION WEDDING INDICATORS ===
-world_bank_api_url = "http://api.worldbank.org/v2/country/{}/indicator/{}?format=json&mrv=1"
-
 # Define Destination Wedding indicators dynamically
 wedding_indicators = {
     "ST.INT.ARVL": "Tourist Arrivals (millions)",  # Scenic Beauty & Popularity
@@ -24,71 +16,84 @@ wedding_indicators = {
     "VC.IHR.PSRC.P5": "Safety Index (Low Crime Rate)",  # Safety Consideration
 }
 
-# Fetch data dynamically from the World Bank API
-def fetch_wedding_data(country_code):
-    country_data = {"countrycode": country_code}
-    for indicator, name in wedding_indicators.items():
-        try:
-            url = world_bank_api_url.format(country_code.lower(), indicator)
-            response = requests.get(url)
-            data = response.json()
-            print(data)
-            if response.status_code == 200 and len(data) > 1 and data[1]:
-                value = data[1][0].get("value", None)
-                country_data[name] = value
-            else:
-                country_data[name] = None
-        except Exception as e:
-            print(f"Error fetching {name} for {country_code}: {str(e)}")
-            country_data[name] = None
-    time.sleep(0.5)  # Prevent API rate limiting
-    return country_data
-
-# Fetch data for all countries
-wedding_data = [fetch_wedding_data(country) for country in unique_countries]
-wedding_df = pd.DataFrame(wedding_data)
-
-# === MERGE WEDDING DATA WITH MAIN DATASET ===
-merged_df = df.merge(wedding_df, on="countrycode", how="left")
-
-# ✅ **Ensure all indicator columns exist before imputation**
-indicator_columns = list(wedding_indicators.values())
-for col in indicator_columns:
-    if col not in merged_df.columns:
-        merged_df[col] = None  # Create missing columns if they don't exist
-
-# === HANDLING MISSING VALUES DYNAMICALLY ===
-knn_imputer = KNNImputer(n_neighbors=5)
-
-# ✅ **Use correct column list for imputation**
-imputed_values = knn_imputer.fit_transform(merged_df[indicator_columns])
-
-# ✅ **Assign values correctly to prevent shape mismatch**
-merged_df[indicator_columns] = imputed_values
-print("✅ KNN Imputation Applied for Missing Values")
-
-# === NORMALIZATION FOR FAIR RANKING ===
-scaler = MinMaxScaler()
-
-# ✅ **Ensure proper normalization of indicators**
-merged_df[indicator_columns] = scaler.fit_transform(merged_df[indicator_columns])
-
 # === COMPUTING DESTINATION WEDDING SCORE ===
+# Indicators whose growth and volatility over the stored years also count
+trends = ["ST.INT.ARVL"]
+
 weights = {
-    "Tourist Arrivals (millions)": 0.3,  # Scenic Beauty & Popularity
+    "Tourist Arrivals (millions)": 0.25,  # Scenic Beauty & Popularity
     "Ease of Business Score": 0.2,  # Ease of Legal Marriage
-    "GDP per Capita (USD)": 0.2,  # Luxury Infrastructure Proxy
-    "International Air Passengers": 0.2,  # Accessibility
+    "GDP per Capita (USD)": 0.15,  # Luxury Infrastructure Proxy
+    "International Air Passengers": 0.15,  # Accessibility
     "Safety Index (Low Crime Rate)": 0.1,  # Safety
+    "Tourist Arrivals (millions) CAGR": 0.15,  # Rising Popularity
+    "Tourist Arrivals (millions) Volatility": -0.05,  # Unsteady Demand
 }
 
-# ✅ **Ensure correct weight application and Destination Wedding Score calculation**
-merged_df["Destination Wedding Score"] = merged_df[list(weights.keys())].mul(pd.Series(weights)).sum(axis=1)
+indicators = wedding_indicators
+score_column = "Destination Wedding Score"
+output_file = "destination_wedding_ranking.parquet"
+csv_file = "destination_wedding_ranking.csv"
+# Columns of the ranking the backends read
+output_columns = ["name", "countrycode"] + list(weights) + [score_column]
+
+
+def score_countries(wedding_df):
+    """ Impute, normalize and score the indicators, one row per country (indexed by countrycode). """
+    country_df = wedding_df.set_index("countrycode")
+
+    # ✅ **Ensure all indicator columns exist before imputation**
+    indicator_columns = list(wedding_indicators.values()) + trend_columns(wedding_indicators, trends)
+    for col in indicator_columns:
+        if col not in country_df.columns:
+            country_df[col] = None  # Create missing columns if they don't exist
+
+    # === HANDLING MISSING VALUES DYNAMICALLY ===
+    # Regression on the observed indicators, one fit per missingness pattern
+    country_df[indicator_columns] = impute(country_df[indicator_columns].to_numpy(dtype=float), indicator_columns)
+    print("✅ Regression-Based Imputation Applied for Missing Values")
+
+    # === NORMALIZATION FOR FAIR RANKING ===
+    scaler = MinMaxScaler()
+
+    # ✅ **Ensure proper normalization of indicators**
+    country_df[indicator_columns] = scaler.fit_transform(country_df[indicator_columns])
+
+    # ✅ **Ensure correct weight application and Destination Wedding Score calculation**
+    country_df[score_column] = country_df[list(weights.keys())].mul(pd.Series(weights)).sum(axis=1)
+    return country_df
+
+
+def rank_cities(df, country_df):
+    """ Broadcast the country scores to every city of the country, best first. """
+    merged_df = df.join(country_df, on="countrycode")
+    return merged_df.sort_values(score_column, ascending=False)
+
+
+def main():
+    # Load country dataset
+    parser = argparse.ArgumentParser(description="Destination Wedding Score per city")
+    parser.add_argument("--cities", default=default_city_file(), help="city dataset with countrycode and name columns")
+    parser.add_argument("--store", default=None, help="World Bank indicator store (SQLite)")
+    parser.add_argument("--csv", action="store_true", help=f"also write the full ranking to {csv_file}")
+    args = parser.parse_args()
+    df = load_cities(args.cities)
+
+    # Extract unique country codes
+    unique_countries = df["countrycode"].unique()
+    print(f"Total Unique Countries Found: {len(unique_countries)}\n")
+
+    # Read the indicators from the shared store (downloaded once, refreshed when stale)
+    wedding_df = fetch_world_bank_data(unique_countries, wedding_indicators, args.store, trends)
+
+    # Score at country level, then sort and export the results
+    merged_df = rank_cities(df, score_countries(wedding_df))
+    write_ranking(merged_df, output_file, output_columns, csv_file if args.csv else None)
+
+    # Display top-ranked Wedding Destinations
+    print("\n===== TOP 10 DESTINATION WEDDING LOCATIONS =====")
+    print(merged_df[["countrycode", "name", score_column]].head(10))
 
-# Sort results
-merged_df = merged_df.sort_values("Destination Wedding Score", ascending=False)
-merged_df.to_csv("destination_wedding_ranking.csv", index=False)
 
-# Display top-ranked Wedding Destinations
-print("\n===== TOP 10 DESTINATION WEDDING LOCATIONS =====")
-print(merged_df[["countrycode", "name", "Destination Wedding Score"]].head(10))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# worldbank.py
+"""
+World Bank indicators for the score models, through a shared local store.
+
+Each indicator is fetched for every country at once, as the full yearly
+series since INDICATOR_START_YEAR (`country/all/indicator/X?date=2000:2025`,
+paged), and kept in a SQLite store keyed by (indicator, country, year). All
+three score models read from the same store, so rebuilding them downloads
+each indicator once.
+
+The models use the most recent value of each country, and trend features
+(CAGR, volatility, see trends.py) computed from the stored series laid out
+as a dense indicator x country x year cube.
+
+Refresh is conditional: an indicator younger than INDICATOR_MAX_AGE is used
+as is; an older one is re-downloaded only if the World Bank's `lastupdated`
+date for it has changed (checked with a one-row request). If a refresh
+fails, the stored values are used.
+
+Settings (environment):
+  WORLD_BANK_API_URL : API base URL, e.g. a local stand-in server
+                       (default http://api.worldbank.org/v2)
+  INDICATOR_STORE    : SQLite file (default models/dataset/indicators.sqlite)
+  INDICATOR_MAX_AGE  : seconds before an indicator is re-checked (default 7 days)
+  INDICATOR_START_YEAR : first year of the stored series (default 2000)
+  CITY_DETAILS_FILE  : city dataset read by the score models, a CSV with
+                       countrycode and name columns (default
+                       models/dataset/complete_city_details_geonamescache.csv,
+                       which is not checked in)
+"""
+import datetime
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from trends import cagr, volatility
+
+DATASET_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dataset"))
+WORLD_BANK_API_URL = os.environ.get("WORLD_BANK_API_URL", "http://api.worldbank.org/v2")
+PER_PAGE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    indicator TEXT NOT NULL,
+    country TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (indicator, country, year)
+);
+CREATE TABLE IF NOT EXISTS fetches (
+    indicator TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    last_updated TEXT
+);
+CREATE TABLE IF NOT EXISTS series (
+    indicator TEXT PRIMARY KEY,
+    start_year INTEGER NOT NULL
+);
+"""
+
+
+CITY_COLUMNS = ("countrycode", "name")
+
+
+def default_city_file():
+    return os.environ.get("CITY_DETAILS_FILE",
+                          os.path.join(DATASET_DIR, "complete_city_details_geonamescache.csv"))
+
+
+def load_cities(path):
+    """ Read the city dataset, exiting with a hint when it is missing or lacks the needed columns. """
+    if not os.path.exists(path):
+        sys.exit(f"City dataset {path} not found: pass --cities or set CITY_DETAILS_FILE "
+                 f"to a CSV with {' and '.join(CITY_COLUMNS)} columns")
+    df = pd.read_csv(path)
+    missing = [column for column in CITY_COLUMNS if column not in df.columns]
+    if missing:
+        sys.exit(f"City dataset {path} is missing columns {', '.join(missing)}: pass --cities or set "
+                 f"CITY_DETAILS_FILE to a CSV with {' and '.join(CITY_COLUMNS)} columns")
+    return df
+
+
+def indicator_pages(indicator, params, session=None, base_url=None):
+    """ Yield (metadata, rows) for every page of an all-countries indicator query. """
+    session = session or requests
+    url = f"{(base_url or WORLD_BANK_API_URL).rstrip('/')}/country/all/indicator/{indicator}"
+    page, pages = 1, 1
+    while page <= pages:
+        response = session.get(url, params={"format": "json", "per_page": PER_PAGE, **params, "page": page},
+                               timeout=60)
+        response.raise_for_status()
+        data = response.json()
+        if len(data) < 2 or data[1] is None:
+            # Error payloads come back as [{"message": [...]}]
+            raise ValueError(f"No data for {indicator}: {data[0]}")
+        pages = int(data[0].get("pages", 1))
+        yield data[0], data[1]
+        page += 1
+
+
+def trend_columns(indicators, trends):
+    """ Names of the trend feature columns for the `trends` indicator codes. """
+    return [f"{indicators[code]} {feature}" for code in trends for feature in ("CAGR", "Volatility")]
+
+
+def fetch_indicator(indicator, start_year, session=None, base_url=None):
+    """
+    Yearly series of `indicator` since `start_year` for every economy, as
+    ([(ISO2 country code, year, value)], lastupdated). Values are None where
+    the World Bank has no figure for that year.
+    """
+    rows, last_updated = [], None
+    date = f"{start_year}:{datetime.date.today().year}"
+    for meta, page in indicator_pages(indicator, {"date": date}, session, base_url):
+        last_updated = meta.get("lastupdated", last_updated)
+        rows.extend((row["country"]["id"], int(row["date"]), row["value"]) for row in page)
+    return rows, last_updated
+
+
+def probe_last_updated(indicator, session=None, base_url=None):
+    """ The indicator's `lastupdated` date, from a one-row request. """
+    session = session or requests
+    url = f"{(base_url or WORLD_BANK_API_URL).rstrip('/')}/country/all/indicator/{indicator}"
+    response = session.get(url, params={"format": "json", "mrv": 1, "per_page": 1}, timeout=60)
+    response.raise_for_status()
+    return response.json()[0].get("lastupdated")
+
+
+class IndicatorStore:
+    def __init__(self, path=None, base_url=None, max_age=None, start_year=None):
+        self.path = path or os.environ.get("INDICATOR_STORE", os.path.join(DATASET_DIR, "indicators.sqlite"))
+        self.base_url = base_url
+        self.max_age = int(os.environ.get("INDICATOR_MAX_AGE", 7 * 24 * 3600)) if max_age is None else max_age
+        self.start_year = int(os.environ.get("INDICATOR_START_YEAR", 2000)) if start_year is None else start_year
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def refresh(self, indicator, session=None, force=False):
+        """ Re-download `indicator` if it is stale and changed. Returns True if it was. """
+        known = self.db.execute("SELECT fetched_at, last_updated FROM fetches WHERE indicator = ?",
+                                (indicator,)).fetchone()
+        covered = self.db.execute("SELECT start_year FROM series WHERE indicator = ?", (indicator,)).fetchone()
+        # Stores filled with single years (or from a later year) are fetched again
+        if known and not force and covered and covered[0] <= self.start_year:
+            if time.time() - known[0] < self.max_age:
+                return False
+            if known[1] is not None and probe_last_updated(indicator, session, self.base_url) == known[1]:
+                with self.db:
+                    self.db.execute("UPDATE fetches SET fetched_at = ? WHERE indicator = ?", (time.time(), indicator))
+                return False
+        rows, last_updated = fetch_indicator(indicator, self.start_year, session, self.base_url)
+        with self.db:
+            self.db.execute("DELETE FROM observations WHERE indicator = ?", (indicator,))
+            self.db.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)",
+                                ((indicator, country, year, value) for country, year, value in rows))
+            self.db.execute("INSERT OR REPLACE INTO fetches VALUES (?, ?, ?)",
+                            (indicator, time.time(), last_updated))
+            self.db.execute("INSERT OR REPLACE INTO series VALUES (?, ?)", (indicator, self.start_year))
+        print(f"World Bank {indicator}: stored {len(rows)} rows (updated {last_updated})")
+        return True
+
+    def cube(self, indicators, country_codes):
+        """
+        Stored series as a dense array values[indicator, country, year]
+        (NaN where there is no figure), with the years of the last axis.
+        """
+        placeholders = ", ".join("?" * len(indicators))
+        rows = pd.read_sql_query(
+            f"SELECT indicator, country, year, value FROM observations WHERE indicator IN ({placeholders})",
+            self.db, params=list(indicators)
+        )
+        first = int(rows["year"].min()) if len(rows) else self.start_year
+        last = int(rows["year"].max()) if len(rows) else self.start_year
+        years = np.arange(first, last + 1)
+        values = np.full((len(indicators), len(country_codes), len(years)), np.nan)
+        i = pd.Index(list(indicators)).get_indexer(rows["indicator"])
+        c = pd.Index(list(country_codes)).get_indexer(rows["country"])
+        found = c >= 0
+        values[i[found], c[found], rows["year"].to_numpy()[found] - first] = \
+            pd.to_numeric(rows["value"], errors="coerce").to_numpy(dtype=np.float64)[found]
+        return values, years
+
+    def frame(self, country_codes, indicators, session=None, trends=()):
+        """
+        DataFrame with one row per country code and one column per indicator
+        name ({indicator code: column name}) holding its most recent value,
+        refreshing stale indicators. The indicator codes in `trends` also get
+        CAGR and volatility columns (see trend_columns).
+        """
+        wb_df = pd.DataFrame({"countrycode": list(country_codes)})
+        keys = wb_df["countrycode"].astype(str).str.upper()
+        for indicator, name in indicators.items():
+            try:
+                self.refresh(indicator, session)
+            except Exception as e:
+                print(f"Error refreshing {name}, using stored values: {str(e)}")
+
+        values, years = self.cube(list(indicators), keys)
+        # Most recent value with a figure, per indicator and country
+        observed = ~np.isnan(values)
+        last = values.shape[2] - 1 - np.argmax(observed[:, :, ::-1], axis=2)
+        latest = np.take_along_axis(values, last[:, :, None], axis=2)[:, :, 0]
+        growth, spread = cagr(values, years), volatility(values)
+        for i, (indicator, name) in enumerate(indicators.items()):
+            wb_df[name] = latest[i]
+            print(f"World Bank {indicator} ({name}): {wb_df[name].notna().sum()} countries")
+        codes = list(indicators)
+        for indicator in trends:
+            i = codes.index(indicator)
+            wb_df[f"{indicators[indicator]} CAGR"] = growth[i]
+            wb_df[f"{indicators[indicator]} Volatility"] = spread[i]
+        return wb_df
+
+
+def fetch_world_bank_data(country_codes, indicators, store_path=None, trends=()):
+    """ IndicatorStore.frame on the shared store, with one HTTP session. """
+    store = IndicatorStore(store_path)
+    try:
+        with requests.Session() as session:
+            return store.frame(country_codes, indicators, session, trends)
+    finally:
+        store.close()
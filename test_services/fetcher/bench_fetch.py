@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+bench_fetch.py
+
+Throughput benchmark of the dat.py fetch engine against the local stand-in
+server (../standin_server.py), replaying recorded responses with a fixed
+per-request latency, for several worker counts.
+
+The recordings must hold the REST Countries list and the GDP / population
+series of the countries (record them once with
+`python standin_server.py --mode record` and a normal dat.py run).
+
+Usage:
+    python bench_fetch.py --recordings ../recordings --latency 100 --workers 1 4 8 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from standin_server import Faults, Recordings, StandinServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the dat.py fetchers against the stand-in server.")
+    parser.add_argument("--recordings", default="recordings")
+    parser.add_argument("--latency", type=float, default=100.0, help="ms per request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--countries", type=int, default=None, help="only the first N countries")
+    parser.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, error_rate=args.error_rate, seed=0)
+    server = StandinServer(("127.0.0.1", 0), Recordings(args.recordings), faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    # dat.py reads its base URLs at import
+    os.environ["WORLD_BANK_API_URL"] = f"{base}/worldbank"
+    os.environ["REST_COUNTRIES_API_URL"] = f"{base}/restcountries"
+    import dat
+
+    countries = dat.get_country_list()[:args.countries]
+    if not countries:
+        print(f"No REST Countries list in {args.recordings}")
+        return
+    print(f"{len(countries)} countries, {args.latency:.0f} ms per request, error rate {args.error_rate}")
+
+    for workers in args.workers:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            entries = list(executor.map(
+                lambda c: dat.fetch_country(c, 2000, 2020, args.retries), countries))
+        elapsed = time.perf_counter() - started
+        failed = sum(entry["status"] == "failed" for entry in entries)
+        print(f"workers {workers:3}: {elapsed:7.2f} s, {len(countries) / elapsed:7.1f} countries/s, "
+              f"{failed} failed")
+
+    with urllib.request.urlopen(f"{base}/_stats") as response:
+        print("server:", json.load(response))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
+import os
+
 import pandas as pd
 import requests
 
 # Load the CSV file
-file_path = r"C:\Algo_Master\project\complete_city_details_geonamescache.csv"  # Ensure correct file path
+file_path = os.environ.get("CITY_DETAILS_FILE", r"C:\Algo_Master\project\complete_city_details_geonamescache.csv")  # Ensure correct file path
 df = pd.read_csv(file_path)
 
 # Extract unique country codes from the dataset
 unique_countries = df["countrycode"].unique()
 
 # Define World Bank API base URL
-world_bank_api_url = "http://api.worldbank.org/v2/country/{}/indicator/{}?format=json&date=2023"
+# (WORLD_BANK_API_URL points it elsewhere, e.g. at a local stand-in server)
+world_bank_api_url = os.environ.get("WORLD_BANK_API_URL", "http://api.worldbank.org/v2").rstrip("/") + \
+    "/country/{}/indicator/{}?format=json&date=2023"
 
 # Define indicators to fetch from World Bank API
 indicators = {
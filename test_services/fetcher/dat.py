@@ -6,20 +6,45 @@ This script fetches complete country data by:
   1. Using the REST Countries API to get a list of all countries and all available details.
   2. Fetching GDP per capita (indicator: NY.GDP.PCAP.CD) and population (indicator: SP.POP.TOTL)
      time series data from the World Bank using each country's ISO2 code.
+     Countries are fetched concurrently on a bounded thread pool, with retries.
   3. Saving the results into CSV files:
        - all_country_info.csv         : Complete details (flattened) from REST Countries.
        - gdp_per_capita.csv             : Full time series data for GDP per capita.
        - population.csv                 : Full time series data for population.
        - combined_country_info.csv      : Combined data merging country info with latest GDP & population.
-       
+
+Progress is persisted in --progress-dir as each country finishes (the country
+list in countries.json, one line per finished country in progress.jsonl), so
+an interrupted run picks up where it stopped. Countries that still fail after
+the retries are recorded too; pass --retry-failed to try them again.
+
+Usage:
+    python dat.py [--workers 8] [--retries 3] [--progress-dir fetch_progress] [--retry-failed]
+
+The APIs are reached through REST_COUNTRIES_API_URL and WORLD_BANK_API_URL
+(environment), so a run can go to a local stand-in server instead.
+
 Dependencies:
     pip install requests pandas-datareader pandas
 """
 
-import datetime
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 import pandas as pd
-import pandas_datareader.data as web
+import pandas_datareader.wb as wb
+
+# API base URLs, e.g. a local stand-in server (see ../standin_server.py)
+REST_COUNTRIES_API_URL = os.environ.get("REST_COUNTRIES_API_URL", "https://restcountries.com/v3.1")
+WORLD_BANK_API_URL = os.environ.get("WORLD_BANK_API_URL", wb.WB_API_URL)
+# pandas-datareader builds its World Bank URLs from this module constant
+wb.WB_API_URL = WORLD_BANK_API_URL.rstrip("/")
 
 # ---------------------------------------------------
 # Step 1: Fetch Complete Country Data from REST Countries API
@@ -33,7 +58,7 @@ def get_country_list():
         list of dict: Each dictionary contains all details about a country.
                       Only countries with both a common name and an ISO2 code (cca2) are included.
     """
-    url = "https://restcountries.com/v3.1/all"
+    url = f"{REST_COUNTRIES_API_URL.rstrip('/')}/all"
     try:
         response = requests.get(url)
         if response.status_code == 200:
@@ -53,86 +78,166 @@ def get_country_list():
 # Step 2: Fetch Economic Data from World Bank
 # ---------------------------------------------------
 
-def get_gdp_per_capita_by_code(iso2_code, start_year=2000, end_year=2020):
+class WorldBankRejected(Exception):
+    """ A 4xx reply (other than 429): the request itself is wrong, retrying will not help. """
+
+def reject_client_errors(response, *args, **kwargs):
+    # Raised from a response hook, so it escapes the reader's own retry loop at once
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        raise WorldBankRejected(f"HTTP {response.status_code} for {response.url}")
+
+def fetch_indicator_by_code(indicator, column, iso2_code, start_year=2000, end_year=2020):
     """
-    Fetch GDP per capita (current US$) time series data for a given ISO2 country code from the World Bank.
-    
+    Fetch a World Bank indicator time series for a given ISO2 country code.
+    Transport errors, 5xx / 429 replies and unreadable replies are raised, so
+    callers can retry them. A code the World Bank does not know, a rejected
+    (4xx) request or an indicator without data for the country will not
+    change on retry and returns None.
+
     Parameters:
+        indicator (str): World Bank indicator code, e.g. NY.GDP.PCAP.CD.
+        column (str): Name given to the indicator's value column.
         iso2_code (str): Two-letter ISO country code.
         start_year (int): Start year for the time series.
         end_year (int): End year for the time series.
-        
+
     Returns:
-        pandas.DataFrame or None: DataFrame with columns 'date' and 'gdp_per_capita', plus a 'cca2' column.
+        pandas.DataFrame or None: DataFrame with columns 'date' and `column`, plus a 'cca2' column.
     """
+    session = requests.Session()
+    session.hooks["response"].append(reject_client_errors)
+    # DataReader(..., "wb") takes no country, so the World Bank reader is used directly
     try:
-        start = datetime.datetime(start_year, 1, 1)
-        end = datetime.datetime(end_year, 12, 31)
-        data = web.DataReader("NY.GDP.PCAP.CD", "wb", start, end, country=iso2_code)
-        if data is not None and not data.empty:
-            data = data.reset_index()  # Bring the 'date' (year) into a column
-            # Rename the indicator column for clarity
-            if "NY.GDP.PCAP.CD" in data.columns:
-                data = data.rename(columns={"NY.GDP.PCAP.CD": "gdp_per_capita"})
-            else:
-                cols = list(data.columns)
-                if "date" in cols:
-                    cols.remove("date")
-                if cols:
-                    data = data.rename(columns={cols[0]: "gdp_per_capita"})
-            # Add ISO2 code for later merging
-            data["cca2"] = iso2_code
-            return data
-        else:
-            return None
-    except Exception as e:
-        print(f"Error fetching GDP data for {iso2_code}: {e}")
+        data = wb.download(indicator=indicator, country=iso2_code, start=start_year, end=end_year,
+                           errors="raise", session=session)
+    except WorldBankRejected as e:
+        print(f"No {column} data for {iso2_code}: {e}")
+        return None
+    except ValueError as e:
+        # The reader raises ValueError for invalid codes, World Bank error
+        # messages and empty results, and wraps JSON decode errors in one
+        if isinstance(e, json.JSONDecodeError) or isinstance(e.__cause__, json.JSONDecodeError):
+            raise
+        print(f"No {column} data for {iso2_code}: {str(e).splitlines()[0]}")
+        return None
+    finally:
+        session.close()
+    if data is None or data.empty:
         return None
+    data = data.reset_index()  # Bring the 'date' (year) into a column
+    # The World Bank reader names the year level 'year'
+    data = data.rename(columns={"year": "date"})
+    # Rename the indicator column for clarity
+    if indicator in data.columns:
+        data = data.rename(columns={indicator: column})
+    else:
+        cols = list(data.columns)
+        if "date" in cols:
+            cols.remove("date")
+        if cols:
+            data = data.rename(columns={cols[0]: column})
+    # Add ISO2 code for later merging
+    data["cca2"] = iso2_code
+    return data
+
+# ---------------------------------------------------
+# Step 3: Concurrent fetch engine with resumable progress
+# ---------------------------------------------------
 
-def get_population_by_code(iso2_code, start_year=2000, end_year=2020):
+def with_retries(fn, *args, retries=3, backoff=1.0):
     """
-    Fetch total population time series data for a given ISO2 country code from the World Bank.
-    
-    Parameters:
-        iso2_code (str): Two-letter ISO country code.
-        start_year (int): Start year for the time series.
-        end_year (int): End year for the time series.
-        
-    Returns:
-        pandas.DataFrame or None: DataFrame with columns 'date' and 'population', plus a 'cca2' column.
+    Call fn(*args), retrying failures with exponential backoff and jitter.
+    Raises the last error once the retries are used up.
     """
-    try:
-        start = datetime.datetime(start_year, 1, 1)
-        end = datetime.datetime(end_year, 12, 31)
-        data = web.DataReader("SP.POP.TOTL", "wb", start, end, country=iso2_code)
-        if data is not None and not data.empty:
-            data = data.reset_index()
-            if "SP.POP.TOTL" in data.columns:
-                data = data.rename(columns={"SP.POP.TOTL": "population"})
-            else:
-                cols = list(data.columns)
-                if "date" in cols:
-                    cols.remove("date")
-                if cols:
-                    data = data.rename(columns={cols[0]: "population"})
-            data["cca2"] = iso2_code
-            return data
-        else:
-            return None
-    except Exception as e:
-        print(f"Error fetching population data for {iso2_code}: {e}")
-        return None
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+class Progress:
+    """
+    Finished countries, persisted one JSON line each as they complete:
+    {"cca2", "name", "status", "gdp", "population"} where the data entries
+    are lists of records.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "progress.jsonl")
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Line cut short by an interrupted run
+                    self.entries[entry["cca2"]] = entry
+        self._lock = threading.Lock()
+
+    def record(self, entry):
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.entries[entry["cca2"]] = entry
+
+def load_country_list(directory):
+    """
+    The REST Countries list, cached in the progress directory so a resumed
+    run works on the same countries.
+    """
+    path = os.path.join(directory, "countries.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    countries = get_country_list()
+    if countries:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(countries, f)
+    return countries
+
+def fetch_country(country, start_year, end_year, retries):
+    """ Fetch GDP and population for one country into a progress entry. """
+    name = country.get('name', {}).get('common', 'Unknown')
+    iso2 = country.get('cca2')
+    entry = {"cca2": iso2, "name": name, "status": "ok", "gdp": [], "population": []}
+    for key, indicator, column in (("gdp", "NY.GDP.PCAP.CD", "gdp_per_capita"),
+                                   ("population", "SP.POP.TOTL", "population")):
+        try:
+            data = with_retries(fetch_indicator_by_code, indicator, column, iso2, start_year, end_year,
+                                retries=retries)
+        except Exception as e:
+            print(f"Error fetching {column} data for {iso2}: {e}")
+            entry["status"] = "failed"
+            continue
+        if data is not None:
+            # Optionally add the country name for clarity
+            data["country"] = name
+            entry[key] = data.to_dict("records")
+    return entry
 
 # ---------------------------------------------------
-# Step 3: Automation & Data Aggregation
+# Step 4: Automation & Data Aggregation
 # ---------------------------------------------------
 
 def main():
     START_YEAR = 2000
     END_YEAR = 2020
 
+    parser = argparse.ArgumentParser(description="Fetch country info, GDP per capita and population.")
+    parser.add_argument("--workers", type=int, default=8, help="countries fetched at the same time")
+    parser.add_argument("--retries", type=int, default=3, help="retries per request")
+    parser.add_argument("--progress-dir", default="fetch_progress")
+    parser.add_argument("--retry-failed", action="store_true", help="fetch countries that failed last time again")
+    args = parser.parse_args()
+
     print("Fetching complete country data from REST Countries API...")
-    countries = get_country_list()
+    countries = load_country_list(args.progress_dir)
     print(f"Total countries fetched: {len(countries)}")
 
     # Flatten the complete country info using pandas.json_normalize
@@ -140,30 +245,28 @@ def main():
     basic_info_df.to_csv("all_country_info.csv", index=False)
     print("Saved complete country info to all_country_info.csv")
 
+    progress = Progress(args.progress_dir)
+    pending = [c for c in countries
+               if c['cca2'] not in progress.entries
+               or (args.retry_failed and progress.entries[c['cca2']]["status"] == "failed")]
+    print(f"{len(countries) - len(pending)} countries already done, {len(pending)} to fetch")
+
+    total = len(pending)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(fetch_country, country, START_YEAR, END_YEAR, args.retries)
+                   for country in pending]
+        for idx, future in enumerate(as_completed(futures), start=1):
+            entry = future.result()
+            progress.record(entry)
+            print(f"Processed {idx}/{total}: {entry['name']} (ISO2: {entry['cca2']}) {entry['status']}")
+
     # Prepare lists for economic data
-    gdp_list = []
-    population_list = []
-    
-    total = len(countries)
-    for idx, country in enumerate(countries, start=1):
-        # Use the common name and ISO2 code from the REST Countries data
-        name = country.get('name', {}).get('common', 'Unknown')
-        iso2 = country.get('cca2')
-        print(f"Processing {idx}/{total}: {name} (ISO2: {iso2})")
-        
-        # Fetch GDP per capita data using the ISO2 code
-        gdp_data = get_gdp_per_capita_by_code(iso2, START_YEAR, END_YEAR)
-        if gdp_data is not None:
-            # Optionally add the country name for clarity
-            gdp_data["country"] = name
-            gdp_list.append(gdp_data)
-        
-        # Fetch population data using the ISO2 code
-        pop_data = get_population_by_code(iso2, START_YEAR, END_YEAR)
-        if pop_data is not None:
-            pop_data["country"] = name
-            population_list.append(pop_data)
-    
+    gdp_list = [pd.DataFrame(e["gdp"]) for e in progress.entries.values() if e["gdp"]]
+    population_list = [pd.DataFrame(e["population"]) for e in progress.entries.values() if e["population"]]
+    failed = [e["cca2"] for e in progress.entries.values() if e["status"] == "failed"]
+    if failed:
+        print(f"{len(failed)} countries failed after retries: {', '.join(failed)} (use --retry-failed)")
+
     # Concatenate economic data if available
     if gdp_list:
         gdp_df = pd.concat(gdp_list, ignore_index=True)
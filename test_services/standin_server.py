@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+"""
+standin_server.py
+
+Local stand-in for the World Bank v2 and REST Countries v3.1 APIs, so the
+data pipelines (fetcher/dat.py, fetcher/country_data.py and the score models
+in models/AI-score-model/model) can run and be benchmarked without internet.
+
+Each API is served under its own prefix:
+    http://127.0.0.1:8800/worldbank/...      -> https://api.worldbank.org/v2/...
+    http://127.0.0.1:8800/restcountries/...  -> https://restcountries.com/v3.1/...
+and the pipelines are pointed at it through their base-URL settings:
+    WORLD_BANK_API_URL=http://127.0.0.1:8800/worldbank
+    REST_COUNTRIES_API_URL=http://127.0.0.1:8800/restcountries
+
+Modes:
+  replay (default) : answer from the recordings directory; requests that
+                     were never recorded get the API's own "not found" reply
+  record           : forward to the real API and save every successful or
+                     client-error response (not 429 / 5xx) for later replay
+
+Recordings are one JSON file per request, keyed by path and query string
+(parameter order and name case do not matter).
+
+Fault injection, applied before the reply (replay and record):
+  --latency / --jitter : delay each reply by latency + uniform(0, jitter) ms
+  --error-rate         : fraction of requests answered with one of
+                         --error-status (default 500, 503, 429)
+  --drop-rate          : fraction of requests whose connection is closed
+                         without a reply
+  --seed               : makes the injected faults repeatable
+
+GET /_stats returns the request, replay, miss and injected fault counts.
+
+Usage:
+    python standin_server.py --mode record --recordings recordings
+    python standin_server.py --latency 50 --jitter 50 --error-rate 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UPSTREAMS = {
+    "worldbank": "https://api.worldbank.org/v2",
+    "restcountries": "https://restcountries.com/v3.1",
+}
+
+# Bodies the real APIs send for unknown resources
+NOT_FOUND = {
+    "worldbank": [{"message": [{"id": "120", "key": "Invalid value",
+                                "value": "The provided parameter value is not valid"}]}],
+    "restcountries": {"status": 404, "message": "Not Found"},
+}
+
+
+def request_key(service, path, query):
+    """ File name of the recording for a request. """
+    params = sorted((name.lower(), value) for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True))
+    canonical = f"{service}/{path.strip('/')}?{urllib.parse.urlencode(params)}"
+    return f"{service}-{hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20]}.json"
+
+
+class Recordings:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self, service, path, query):
+        file = os.path.join(self.directory, request_key(service, path, query))
+        if not os.path.exists(file):
+            return None
+        with open(file, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, service, path, query, status, content_type, body):
+        file = os.path.join(self.directory, request_key(service, path, query))
+        record = {"service": service, "path": path, "query": query, "status": status,
+                  "content_type": content_type, "body": body}
+        tmp = f"{file}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp, file)
+
+
+class Faults:
+    """ Latency and error injection, shared by all handler threads. """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(500, 503, 429),
+                 drop_rate=0.0, seed=None):
+        self.latency = latency / 1000.0
+        self.jitter = jitter / 1000.0
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """ (delay in seconds, "drop" / HTTP status to fail with / None) """
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+            status = self._random.choice(self.error_statuses)
+        if roll < self.drop_rate:
+            return delay, "drop"
+        if roll < self.drop_rate + self.error_rate:
+            return delay, status
+        return delay, None
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, recordings, faults, mode="replay", upstreams=None, timeout=60):
+        super().__init__(address, StandinHandler)
+        self.recordings = recordings
+        self.faults = faults
+        self.mode = mode
+        self.upstreams = upstreams or UPSTREAMS
+        self.timeout = timeout
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "missed": 0, "errors": 0, "dropped": 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, status, content_type, body, headers=()):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status, payload, headers=()):
+        self.send_body(status, "application/json;charset=utf-8", json.dumps(payload), headers)
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/_stats":
+            with server._stats_lock:
+                return self.send_json(200, dict(server.stats))
+
+        service, _, path = url.path.lstrip("/").partition("/")
+        if service not in server.upstreams:
+            return self.send_json(404, {"message": f"Unknown service {service!r}, expected one of "
+                                                   f"{', '.join(server.upstreams)}"})
+        server.count("requests")
+
+        delay, fault = server.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if fault == "drop":
+            server.count("dropped")
+            self.close_connection = True
+            return
+        if fault is not None:
+            server.count("errors")
+            headers = [("Retry-After", "1")] if fault in (429, 503) else []
+            return self.send_json(fault, {"message": f"Injected error {fault}"}, headers)
+
+        if server.mode == "record":
+            status, content_type, body = self.forward(service, path, url.query)
+            if status < 500 and status != 429:
+                server.recordings.save(service, path, url.query, status, content_type, body)
+                server.count("recorded")
+            return self.send_body(status, content_type, body)
+
+        record = server.recordings.load(service, path, url.query)
+        if record is None:
+            server.count("missed")
+            return self.send_json(404, NOT_FOUND[service])
+        server.count("replayed")
+        self.send_body(record["status"], record["content_type"], record["body"])
+
+    def forward(self, service, path, query):
+        upstream = f"{self.server.upstreams[service].rstrip('/')}/{path}"
+        if query:
+            upstream += f"?{query}"
+        request = urllib.request.Request(upstream, headers={"User-Agent": "yatra-standin/1.0"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.server.timeout) as response:
+                return (response.status, response.headers.get("Content-Type", "application/json"),
+                        response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Content-Type", "application/json"), e.read().decode("utf-8")
+        except Exception as e:
+            return 502, "application/json", json.dumps({"message": f"Upstream error: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the World Bank and REST Countries APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay")
+    parser.add_argument("--recordings", default="recordings", help="directory of recorded responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many ms added at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed")
+    parser.add_argument("--error-status", type=int, nargs="+", default=[500, 503, 429])
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of connections closed unanswered")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--world-bank-upstream", default=UPSTREAMS["worldbank"])
+    parser.add_argument("--rest-countries-upstream", default=UPSTREAMS["restcountries"])
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.error_rate, tuple(args.error_status), args.drop_rate, args.seed)
+    upstreams = {"worldbank": args.world_bank_upstream, "restcountries": args.rest_countries_upstream}
+    server = StandinServer((args.host, args.port), Recordings(args.recordings), faults, args.mode, upstreams)
+    base = f"http://{args.host}:{server.server_port}"
+    print(f"Serving {args.mode} from {args.recordings} on {base}")
+    print(f"  WORLD_BANK_API_URL={base}/worldbank")
+    print(f"  REST_COUNTRIES_API_URL={base}/restcountries")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()